@@ -0,0 +1,138 @@
+"""
+    Vectorized subtree aggregates (sum, min, max, count) over trees with numeric elements.
+
+    The tree is flattened once into postorder arrays of parent indices and depths; every
+    aggregate is then computed for all nodes with one NumPy pass per level, deepest first.
+"""
+import numpy as np
+
+OPERATIONS = ('sum', 'min', 'max', 'count')
+
+
+class FlatTree:
+    """
+        Postorder flattening of a GeneralTree or LinkedBinary.
+
+        nodes[i] is the i-th node in postorder, parent[i] the index of its parent (-1 for the root)
+        and depth[i] its depth. A child always comes before its parent.
+    """
+
+    def __init__(self, tree):
+        self._tree = tree
+        nodes = []
+        depths = []
+        if tree._root is not None:
+            # root first with the children pushed in order; reversed, this is a postorder.
+            stack = [(tree._root, 0)]
+            while stack:
+                node, d = stack.pop()
+                nodes.append(node)
+                depths.append(d)
+                for c in tree._child_nodes(node):
+                    stack.append((c, d + 1))
+            nodes.reverse()
+            depths.reverse()
+
+        self.nodes = nodes
+        self._index = {node: i for i, node in enumerate(nodes)}
+        self.parent = np.fromiter((self._index[n._parent] if n._parent is not None else -1 for n in nodes),
+                                  dtype=np.int64, count=len(nodes))
+        self.depth = np.array(depths, dtype=np.int64)
+        order = np.argsort(self.depth, kind='stable')
+        bounds = np.searchsorted(self.depth[order], np.arange(self.height() + 2))
+        self.levels = [order[bounds[d]:bounds[d + 1]] for d in range(self.height() + 1)]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def height(self):
+        return int(self.depth.max()) if len(self.nodes) else -1
+
+    def index(self, p):
+        """
+            Returns the postorder index of position p.
+        """
+        return self._index[self._tree._validate(p)]
+
+    def position(self, i):
+        """
+            Returns the position of the i-th node in postorder.
+        """
+        return self._tree._make_position(self.nodes[i])
+
+    def values(self, key=None):
+        """
+            Returns an array of the elements, or of key(element), in postorder.
+        """
+        elements = (n._element for n in self.nodes)
+        if key is not None:
+            elements = map(key, elements)
+        return np.fromiter(elements, dtype=np.float64, count=len(self.nodes))
+
+    def subtree_aggregates(self, values=None, operations=OPERATIONS):
+        """
+            Returns SubtreeAggregates with, for every node, the aggregates over its subtree.
+
+            values: array of the node values in postorder; defaults to the elements.
+        """
+        if values is None:
+            values = self.values()
+        values = np.asarray(values)
+        n = len(self.nodes)
+        results = {}
+        for op in operations:
+            if op == 'count':
+                results[op] = np.ones(n, dtype=np.int64)
+            elif op in ('sum', 'min', 'max'):
+                results[op] = values.astype(np.float64, copy=True)
+            else:
+                raise ValueError(f"Unknown operation {op}!")
+
+        for d in range(self.height(), 0, -1):
+            idx = self.levels[d]
+            parents = self.parent[idx]
+            for op, acc in results.items():
+                if op == 'sum' or op == 'count':
+                    acc += np.bincount(parents, weights=acc[idx], minlength=n).astype(acc.dtype)
+                elif op == 'min':
+                    np.minimum.at(acc, parents, acc[idx])
+                else:
+                    np.maximum.at(acc, parents, acc[idx])
+        return SubtreeAggregates(self, results)
+
+
+class SubtreeAggregates:
+    """
+        The subtree aggregates of every node, as postorder arrays and by position.
+    """
+
+    def __init__(self, flat, results):
+        self._flat = flat
+        self._results = results
+
+    def __getitem__(self, op):
+        """
+            Returns the postorder array of the aggregate op.
+        """
+        return self._results[op]
+
+    def at(self, p):
+        """
+            Returns a dictionary of the aggregates over the subtree at position p.
+        """
+        i = self._flat.index(p)
+        return {op: acc[i].item() for op, acc in self._results.items()}
+
+    def items(self):
+        """
+            Generate (position, aggregates) pairs in postorder.
+        """
+        for i in range(len(self._flat)):
+            yield self._flat.position(i), {op: acc[i].item() for op, acc in self._results.items()}
+
+
+def subtree_aggregates(tree, values=None, operations=OPERATIONS):
+    """
+        Returns the subtree aggregates of every node of a GeneralTree or LinkedBinary.
+    """
+    return FlatTree(tree).subtree_aggregates(values, operations)
@@ -0,0 +1,547 @@
+"""
+    Benchmarks for the linked structures and trees.
+
+    python benchmarks.py --max-size 100000 --output baseline.json
+    python benchmarks.py --max-size 100000 --compare baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from linked_list import LinkedQueue, LinkedStack, DoublyLinkedList
+from trees import LinkedBinary, GeneralTree
+from radix_trie import RadixTrie
+from expression_trees import BINARY_OPERATORS, compile_expression
+from range_trees import SegmentTree, FenwickTree
+
+SIZES = [10 ** k for k in range(3, 8)]
+
+BENCHMARKS = {}  # name -> (setup, run)
+
+
+def benchmark(name, setup=None):
+    """
+        Register run(state) as the benchmark name; setup(n) builds the state and is not timed.
+        run returns the number of operations it performed.
+    """
+    def register(run):
+        BENCHMARKS[name] = (setup or (lambda n: n), run)
+        return run
+    return register
+
+
+def balanced_binary(n):
+    """
+        Returns a complete LinkedBinary with n nodes, built level by level.
+    """
+    t = LinkedBinary()
+    q = LinkedQueue()
+    q.enqueue(t.add_root(0))
+    i = 1
+    while i < n:
+        p = q.dequeue()
+        q.enqueue(t.add_left(p, i))
+        i += 1
+        if i < n:
+            q.enqueue(t.add_right(p, i))
+            i += 1
+    return t
+
+
+def parenthetic_string(n, fanout=8):
+    """
+        Returns the parenthetic representation of a complete tree with n nodes.
+    """
+    def subtree(i):
+        first = i * fanout + 1
+        children = [subtree(c) for c in range(first, min(first + fanout, n))]
+        return str(i) + ('(' + ','.join(children) + ')' if children else '')
+    return subtree(0)
+
+
+def general_tree(n):
+    t = GeneralTree()
+    t.parse_parenthetic(parenthetic_string(n))
+    return t
+
+
+# linked_list.py
+
+@benchmark('LinkedQueue.enqueue+dequeue')
+def _queue(n):
+    q = LinkedQueue()
+    for i in range(n):
+        q.enqueue(i)
+    while not q.is_empty():
+        q.dequeue()
+    return 2 * n
+
+
+@benchmark('LinkedStack.push+pop')
+def _stack(n):
+    s = LinkedStack()
+    for i in range(n):
+        s.push(i)
+    while not s.is_empty():
+        s.pop()
+    return 2 * n
+
+
+@benchmark('DoublyLinkedList.insert_last')
+def _dll_insert(n):
+    d = DoublyLinkedList()
+    for i in range(n):
+        d.insert_last(i)
+    return n
+
+
+def _filled_list(n):
+    d = DoublyLinkedList()
+    for i in range(n):
+        d.insert_last(i)
+    return d
+
+
+@benchmark('DoublyLinkedList.iterate', _filled_list)
+def _dll_iterate(d):
+    for _ in d:
+        pass
+    return len(d)
+
+
+@benchmark('DoublyLinkedList.delete_first', _filled_list)
+def _dll_delete(d):
+    n = len(d)
+    while not d.is_empty():
+        d.delete_first()
+    return n
+
+
+def _shuffled_list(n):
+    d = DoublyLinkedList()
+    for i in np.random.default_rng(0).permutation(n).tolist():
+        d._append(i)
+    return d
+
+
+@benchmark('DoublyLinkedList.sort', _shuffled_list)
+def _dll_sort(d):
+    d.sort()
+    return len(d)
+
+
+@benchmark('DoublyLinkedList.copy_sort_rebuild', _shuffled_list)
+def _dll_copy_sort(d):
+    elements = sorted(d)
+    while not d.is_empty():
+        d.delete_first()
+    for e in elements:
+        d._append(e)
+    return len(d)
+
+
+def _sorted_halves(n):
+    a, b = DoublyLinkedList(), DoublyLinkedList()
+    for i in range(n):
+        (a if i % 3 else b)._append(i)
+    return a, b
+
+
+@benchmark('DoublyLinkedList.merge', _sorted_halves)
+def _dll_merge(state):
+    a, b = state
+    a.merge(b)
+    return len(a)
+
+
+# LinkedBinary
+
+@benchmark('LinkedBinary.build')
+def _binary_build(n):
+    balanced_binary(n)
+    return n
+
+
+@benchmark('LinkedBinary.from_level_order', lambda n: list(range(n)))
+def _binary_from_level_order(elements):
+    LinkedBinary.from_level_order(elements)
+    return len(elements)
+
+
+@benchmark('LinkedBinary.from_sorted', lambda n: list(range(n)))
+def _binary_from_sorted(elements):
+    LinkedBinary.from_sorted(elements)
+    return len(elements)
+
+
+def _traversal(name):
+    def run(t):
+        for _ in getattr(t, name)():
+            pass
+        return len(t)
+    return run
+
+
+for _name in ('preorder', 'postorder', 'inorder', 'breadthfirst'):
+    benchmark('LinkedBinary.' + _name, balanced_binary)(_traversal(_name))
+
+
+def _single_trees(n):
+    trees = []
+    for i in range(n):
+        t = LinkedBinary()
+        t.add_root(i)
+        trees.append(t)
+    return trees
+
+
+@benchmark('LinkedBinary.attach', _single_trees)
+def _binary_attach(trees):
+    # merge pairs of trees under a new root until one tree is left.
+    q = LinkedQueue()
+    for t in trees:
+        q.enqueue(t)
+    count = 0
+    while len(q) > 1:
+        t = LinkedBinary()
+        t.attach(t.add_root(None), q.dequeue(), q.dequeue())
+        q.enqueue(t)
+        count += 1
+    return count
+
+
+@benchmark('LinkedBinary.delete', balanced_binary)
+def _binary_delete(t):
+    n = len(t)
+    # in postorder every node is a leaf by the time it is deleted.
+    for p in list(t.postorder()):
+        t.delete(p)
+    return n
+
+
+# GeneralTree
+
+@benchmark('GeneralTree.parse_parenthetic', parenthetic_string)
+def _parse(s):
+    t = GeneralTree()
+    t.parse_parenthetic(s)
+    return len(t)
+
+
+def _parent_array(n, fanout=8):
+    return list(range(n)), [-1] + [(i - 1) // fanout for i in range(1, n)]
+
+
+@benchmark('GeneralTree.from_parent_array', _parent_array)
+def _from_parent_array(state):
+    GeneralTree.from_parent_array(*state)
+    return len(state[0])
+
+
+@benchmark('GeneralTree.parenthetic', general_tree)
+def _parenthetic(t):
+    t.parenthetic()
+    return len(t)
+
+
+@benchmark('GeneralTree.height', general_tree)
+def _height(t):
+    t.height()
+    return len(t)
+
+
+for _name in ('preorder', 'postorder'):
+    benchmark('GeneralTree.' + _name, general_tree)(_traversal(_name))
+
+
+@benchmark('GeneralTree.apreorder', general_tree)
+def _apreorder(t):
+    async def traverse():
+        count = 0
+        async for _ in t.apreorder(chunk=1000):
+            count += 1
+        return count
+    return asyncio.run(traverse())
+
+
+@benchmark('GeneralTree.cursor_preorder', general_tree)
+def _cursor_preorder(t):
+    c = t.cursor()
+    count = 1
+    while True:
+        if c.to_first_child():
+            count += 1
+            continue
+        while not c.to_next_sibling():
+            if not c.to_parent():
+                return count
+        count += 1
+
+
+# RadixTrie
+
+def _sorted_keys(n):
+    return sorted(f"/srv/{i % 97}/{i % 1009}/item{i}" for i in range(n))
+
+
+@benchmark('RadixTrie.insert', _sorted_keys)
+def _trie_insert(keys):
+    t = RadixTrie()
+    for k in keys:
+        t.insert(k)
+    return len(keys)
+
+
+@benchmark('RadixTrie.from_sorted', _sorted_keys)
+def _trie_from_sorted(keys):
+    RadixTrie.from_sorted((k, None) for k in keys)
+    return len(keys)
+
+
+# range_trees.py, against slicing a NumPy array
+
+def _range_ops(n, count=10000):
+    """
+        Returns an array of n values and count random ranges [lo, hi) with deltas.
+    """
+    rng = np.random.default_rng(0)
+    lo = rng.integers(0, n, count)
+    hi = rng.integers(lo + 1, n + 1)
+    return rng.random(n), lo, hi, rng.integers(-5, 5, count).astype(float)
+
+
+@benchmark('SegmentTree.build', lambda n: np.random.default_rng(0).random(n))
+def _segment_build(values):
+    SegmentTree(values)
+    return len(values)
+
+
+def _segment_ops(n):
+    values, lo, hi, delta = _range_ops(n)
+    return SegmentTree(values), lo.tolist(), hi.tolist(), delta.tolist()
+
+
+@benchmark('SegmentTree.add+query', _segment_ops)
+def _segment_add_query(state):
+    t, lo, hi, delta = state
+    for a, b, d in zip(lo, hi, delta):
+        t.add(a, b, d)
+        t.query(a, b)
+    return 2 * len(lo)
+
+
+def _slice_ops(n):
+    values, lo, hi, delta = _range_ops(n)
+    return values, lo.tolist(), hi.tolist(), delta.tolist()
+
+
+@benchmark('naive.slice_add+sum+min+max', _slice_ops)
+def _slice_add_query(state):
+    a, lo, hi, delta = state
+    for i, j, d in zip(lo, hi, delta):
+        a[i:j] += d
+        s = a[i:j]
+        s.sum(), s.min(), s.max()
+    return 2 * len(lo)
+
+
+def _fenwick_ops(n):
+    values, lo, hi, delta = _range_ops(n)
+    return FenwickTree(values), lo, hi, delta
+
+
+@benchmark('FenwickTree.add+range_sum', _fenwick_ops)
+def _fenwick_add_sum(state):
+    f, lo, hi, delta = state
+    for i, j, d in zip(lo.tolist(), hi.tolist(), delta.tolist()):
+        f.add(i, d)
+        f.range_sum(i, j)
+    return 2 * len(lo)
+
+
+@benchmark('FenwickTree.add_many+range_sum_many', _fenwick_ops)
+def _fenwick_batched(state):
+    f, lo, hi, delta = state
+    f.add_many(lo, delta)
+    f.range_sum_many(lo, hi)
+    return 2 * len(lo)
+
+
+@benchmark('naive.point_add+slice_sum', _slice_ops)
+def _slice_point_add_sum(state):
+    a, lo, hi, delta = state
+    for i, j, d in zip(lo, hi, delta):
+        a[i] += d
+        a[i:j].sum()
+    return 2 * len(lo)
+
+
+# expression_trees.py
+
+def formula():
+    """
+        Returns a LinkedBinary for ((x + y) * (x + y) - z / 4) * (x + y) + 2 * 3 - z ** 2.
+    """
+    def element(spec):
+        return spec[0] if isinstance(spec, tuple) else spec
+
+    def build(p, spec):
+        if isinstance(spec, tuple):
+            build(t.add_left(p, element(spec[1])), spec[1])
+            build(t.add_right(p, element(spec[2])), spec[2])
+
+    xy = ('+', 'x', 'y')
+    spec = ('-', ('+', ('*', ('-', ('*', xy, xy), ('/', 'z', 4)), xy), ('*', 2, 3)), ('**', 'z', 2))
+    t = LinkedBinary()
+    build(t.add_root(element(spec)), spec)
+    return t
+
+
+def _evaluate_recursive(t, node, bindings):
+    """
+        Evaluate the subtree at node by traversing it, as before compilation.
+    """
+    if node._left is None:
+        e = node._element
+        return bindings[e] if isinstance(e, str) else e
+    return BINARY_OPERATORS[node._element](_evaluate_recursive(t, node._left, bindings),
+                                           _evaluate_recursive(t, node._right, bindings))
+
+
+def _formula_rows(n):
+    rng = np.random.default_rng(0)
+    columns = {name: rng.random(n) for name in 'xyz'}
+    rows = [dict(zip('xyz', values)) for values in zip(*(columns[name].tolist() for name in 'xyz'))]
+    return formula(), rows, columns
+
+
+@benchmark('expression.recursive', _formula_rows)
+def _expression_recursive(state):
+    t, rows, _ = state
+    for row in rows:
+        _evaluate_recursive(t, t._root, row)
+    return len(rows)
+
+
+@benchmark('CompiledExpression.evaluate', _formula_rows)
+def _expression_compiled(state):
+    t, rows, _ = state
+    evaluate = compile_expression(t).evaluate
+    for row in rows:
+        evaluate(row)
+    return len(rows)
+
+
+@benchmark('CompiledExpression.run', _formula_rows)
+def _expression_postfix(state):
+    t, rows, _ = state
+    run = compile_expression(t).run
+    for row in rows:
+        run(row)
+    return len(rows)
+
+
+@benchmark('CompiledExpression.evaluate_many', _formula_rows)
+def _expression_many(state):
+    t, rows, columns = state
+    compile_expression(t).evaluate_many(columns)
+    return len(rows)
+
+
+def measure(name, n, repeat=1, memory=True):
+    """
+        Run benchmark name at size n and return a dict of its best time, ops/sec and peak memory.
+    """
+    setup, run = BENCHMARKS[name]
+    best = None
+    ops = 0
+    for _ in range(repeat):
+        state = setup(n)
+        gc.collect()
+        start = time.perf_counter()
+        ops = run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del state
+
+    result = {'seconds': best, 'ops': ops, 'ops_per_sec': ops / best if best else None}
+
+    if memory:
+        state = setup(n)
+        gc.collect()
+        tracemalloc.start()
+        run(state)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run_all(sizes, names, repeat=1, memory=True, out=sys.stdout):
+    """
+        Returns the results of the benchmarks names swept over sizes.
+    """
+    results = {}
+    for name in names:
+        results[name] = {}
+        for n in sizes:
+            r = measure(name, n, repeat, memory)
+            results[name][str(n)] = r
+            peak = r.get('peak_bytes')
+            print(f"{name:36} n={n:<9} {r['seconds']:10.4f}s {r['ops_per_sec'] or 0:14,.0f} ops/s"
+                  + (f" {peak / 2 ** 20:10.2f} MiB" if peak is not None else ''), file=out)
+    return {'python': platform.python_version(), 'results': results}
+
+
+def compare(baseline, current, threshold):
+    """
+        Returns a list of (name, n, old seconds, new seconds) for the results that
+        are slower than baseline by more than the fraction threshold.
+    """
+    regressions = []
+    for name, by_size in current['results'].items():
+        for n, r in by_size.items():
+            old = baseline['results'].get(name, {}).get(n)
+            if old is not None and r['seconds'] > old['seconds'] * (1 + threshold):
+                regressions.append((name, int(n), old['seconds'], r['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--max-size', type=int, default=None, help='skip the sizes larger than this')
+    parser.add_argument('--filter', default='', help='only run the benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=3, help='keep the best of this many runs')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, as a fraction')
+    args = parser.parse_args(argv)
+
+    sizes = [n for n in args.sizes if args.max_size is None or n <= args.max_size]
+    names = [name for name in BENCHMARKS if args.filter in name]
+    current = run_all(sizes, names, args.repeat, not args.no_memory)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for name, n, old, new in regressions:
+            print(f"REGRESSION {name} n={n}: {old:.4f}s -> {new:.4f}s ({new / old - 1:+.0%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
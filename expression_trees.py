@@ -0,0 +1,276 @@
+"""
+    Compiler for arithmetic expression trees stored in a LinkedBinary.
+
+    Internal nodes hold an operator ('+', '-', '*', '/', '//', '%', '**'; '-' and '+' are
+    also unary with a single child) and leaves hold a number, a numeric string or the name
+    of a variable. The tree is compiled once into a DAG in which equal subexpressions are
+    shared and constant subexpressions are folded, and from there into a flat postfix
+    program and a generated Python function, which also evaluates NumPy columns at once.
+"""
+import math
+import numbers
+import operator
+from collections.abc import Mapping
+
+import numpy as np
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '**': operator.pow,
+}
+
+UNARY_OPERATORS = {
+    '-': operator.neg,
+    '+': operator.pos,
+}
+
+# A constant power with more bits than this is left for evaluation rather than computed
+# while compiling, where 10 ** (10 ** 9) would not finish.
+_FOLD_BITS = 4096
+
+
+def _leaf(element):
+    """
+        Returns ('const', type, value) or ('var', name) for the element of a leaf.
+    """
+    if isinstance(element, numbers.Number):
+        return 'const', type(element), element
+    if isinstance(element, str):
+        if not element.isidentifier():  # 'inf' and 'nan' are names of variables
+            for parse in (int, float):
+                try:
+                    value = parse(element)
+                    return 'const', type(value), value
+                except ValueError:
+                    pass
+        return 'var', element
+    raise ValueError(f"{element!r} is neither a number nor the name of a variable!")
+
+
+def _huge_power(base, exponent):
+    """
+        Returns True if base ** exponent may have more than _FOLD_BITS bits.
+    """
+    if not isinstance(base, numbers.Rational) or not isinstance(exponent, numbers.Integral):
+        return False
+    bits = max(abs(base.numerator), base.denominator).bit_length()
+    return bits > 1 and bits * abs(int(exponent)) > _FOLD_BITS
+
+
+class CompiledExpression:
+    """
+        An expression tree compiled for repeated evaluation.
+
+        variables: the names of the variables, in order of first appearance.
+        program: the postfix program, a list of instructions
+            ('LOAD', name), ('CONST', value), ('APPLY', operator, arity),
+            ('SAVE', slot) to keep the top of the stack for later, ('RECALL', slot) to push it again.
+        source: the source code of function, which takes the variables as positional arguments.
+    """
+
+    def __init__(self, entries, root):
+        # entries[k] is ('const', type, value), ('var', name) or (operator, k1[, k2]) with k1, k2 < k.
+        self._entries = entries
+        self._root = root
+        uses = [0] * len(entries)
+        uses[root] += 1
+        for entry in entries:
+            if entry[0] not in ('const', 'var'):
+                for k in entry[1:]:
+                    uses[k] += 1
+        self._uses = uses
+        self.variables = tuple(entry[1] for entry in entries if entry[0] == 'var')
+        self.program = self._postfix()
+        self.source, self.function = self._generate()
+
+    def num_operations(self):
+        """
+            Returns the number of operations left after folding and sharing.
+        """
+        return sum(1 for entry in self._entries if entry[0] not in ('const', 'var'))
+
+    def _postfix(self):
+        entries, uses = self._entries, self._uses
+        program = []
+        emitted = set()
+        stack = [(self._root, False)]
+        while stack:
+            k, expanded = stack.pop()
+            entry = entries[k]
+            if expanded:
+                program.append(('APPLY', entry[0], len(entry) - 1))
+                if uses[k] > 1:
+                    program.append(('SAVE', k))
+                    emitted.add(k)
+            elif k in emitted:
+                program.append(('RECALL', k))
+            elif entry[0] == 'const':
+                program.append(('CONST', entry[2]))
+            elif entry[0] == 'var':
+                program.append(('LOAD', entry[1]))
+            else:
+                stack.append((k, True))
+                for c in reversed(entry[1:]):
+                    stack.append((c, False))
+        return program
+
+    def _generate(self):
+        """
+            Returns the source of a function computing one local variable per operation, and the function.
+        """
+        namespace = {}
+        names = []
+        lines = []
+        params = []
+        for k, entry in enumerate(self._entries):
+            if entry[0] == 'const':
+                value = entry[2]
+                literal = (type(value) is int and value.bit_length() <= _FOLD_BITS
+                           or type(value) is float and math.isfinite(value))
+                if literal:
+                    # parenthesized so that -2 ** x stays (-2) ** x
+                    names.append(f'({value!r})' if repr(value).startswith('-') else repr(value))
+                else:
+                    names.append(f'c{k}')
+                    namespace[f'c{k}'] = value
+            elif entry[0] == 'var':
+                names.append(f'v{len(params)}')
+                params.append(names[-1])
+            else:
+                if len(entry) == 3:
+                    expression = f'{names[entry[1]]} {entry[0]} {names[entry[2]]}'
+                else:
+                    expression = f'{entry[0]}{names[entry[1]]}'
+                names.append(f't{k}')
+                lines.append(f'    t{k} = {expression}')
+        lines.append(f'    return {names[self._root]}')
+        source = f"def expression({', '.join(params)}):\n" + '\n'.join(lines) + '\n'
+        exec(compile(source, '<expression>', 'exec'), namespace)
+        return source, namespace['expression']
+
+    def _arguments(self, bindings):
+        try:
+            return [bindings[name] for name in self.variables]
+        except KeyError as e:
+            raise ValueError(f"No value for the variable {e.args[0]!r}!") from None
+
+    def evaluate(self, bindings):
+        """
+            Returns the value of the expression for the mapping bindings of variable names to values.
+        """
+        return self.function(*self._arguments(bindings))
+
+    def __call__(self, *args):
+        """
+            Returns the value of the expression for the values of the variables, in order.
+        """
+        return self.function(*args)
+
+    def run(self, bindings):
+        """
+            Returns the value of the expression computed by the postfix program.
+        """
+        stack = []
+        saved = {}
+        for instruction in self.program:
+            code = instruction[0]
+            if code == 'LOAD':
+                try:
+                    stack.append(bindings[instruction[1]])
+                except KeyError:
+                    raise ValueError(f"No value for the variable {instruction[1]!r}!") from None
+            elif code == 'CONST':
+                stack.append(instruction[1])
+            elif code == 'APPLY':
+                if instruction[2] == 2:
+                    right = stack.pop()
+                    stack.append(BINARY_OPERATORS[instruction[1]](stack.pop(), right))
+                else:
+                    stack.append(UNARY_OPERATORS[instruction[1]](stack.pop()))
+            elif code == 'SAVE':
+                saved[instruction[1]] = stack[-1]
+            else:
+                stack.append(saved[instruction[1]])
+        return stack.pop()
+
+    def evaluate_many(self, bindings):
+        """
+            Returns an array of the values of the expression for many bindings at once.
+
+            bindings maps every variable to a column of values (a NumPy array or a sequence),
+            or is a sequence of mappings, one per row. Each operation runs once over whole
+            columns; scalar columns are broadcast, and the result has the shape of all the
+            columns broadcast together.
+        """
+        if not isinstance(bindings, Mapping):
+            rows = list(bindings)
+            try:
+                columns = {name: np.array([row[name] for row in rows]) for name in self.variables}
+            except KeyError as e:
+                raise ValueError(f"No value for the variable {e.args[0]!r}!") from None
+            shape = (len(rows),)
+        else:
+            columns = {name: np.asarray(column) for name, column in bindings.items()}
+            # every column counts, even for a variable that folding removed
+            shape = np.broadcast_shapes(*(c.shape for c in columns.values()))
+        result = self.function(*self._arguments(columns))
+        return np.broadcast_to(result, shape) if np.shape(result) != shape else np.asarray(result)
+
+
+def compile_expression(tree, p=None):
+    """
+        Compile the expression tree stored in the LinkedBinary tree, or in its subtree at p.
+    """
+    if p is not None:
+        top = tree._validate(p)
+    elif tree._root is not None:
+        top = tree._root
+    else:
+        raise ValueError("The tree is empty!")
+
+    entries = []
+    numbers_of = {}  # entry -> its index in entries, so equal subexpressions are shared
+
+    def number(entry):
+        # constants are told apart by their repr too, as 0.0 == -0.0
+        key = entry if entry[0] != 'const' else entry + (repr(entry[2]),)
+        k = numbers_of.get(key)
+        if k is None:
+            k = numbers_of[key] = len(entries)
+            entries.append(entry)
+        return k
+
+    # postorder without recursion, so deep trees compile too
+    value_of = {}
+    stack = [(top, False)]
+    while stack:
+        node, expanded = stack.pop()
+        children = [c for c in (node._left, node._right) if c is not None]
+        if not children:
+            value_of[node] = number(_leaf(node._element))
+        elif not expanded:
+            stack.append((node, True))
+            for c in reversed(children):
+                stack.append((c, False))
+        else:
+            symbol = node._element
+            operators = BINARY_OPERATORS if len(children) == 2 else UNARY_OPERATORS
+            if symbol not in operators:
+                raise ValueError(f"{symbol!r} is not an operator with {len(children)} operand(s)!")
+            args = [value_of.pop(c) for c in children]
+            operands = [entries[k] for k in args]
+            entry = (symbol, *args)
+            if all(e[0] == 'const' for e in operands) and not (
+                    symbol == '**' and len(operands) == 2 and _huge_power(operands[0][2], operands[1][2])):
+                try:
+                    value = operators[symbol](*(e[2] for e in operands))
+                    entry = ('const', type(value), value)
+                except Exception:
+                    pass  # left for evaluation to raise
+            value_of[node] = number(entry)
+    return CompiledExpression(entries, value_of[top])
@@ -0,0 +1,225 @@
+"""
+    Opt-in instrumentation of the linked structures and trees.
+
+    While enabled, the methods of the instrumented classes are replaced by wrappers that
+    count calls, time them and count the _Node and Position objects they allocate.
+    Disabling restores the original methods, so there is no cost when it is off.
+
+    with instrument() as profile:
+        tree.parse_parenthetic(content)
+    print(profile.report())
+"""
+import functools
+import inspect
+import json
+import marshal
+import time
+
+from linked_list import LinkedQueue, LinkedStack, DoublyLinkedList
+from trees import LinkedBinary, GeneralTree
+
+DEFAULT_CLASSES = (LinkedQueue, LinkedStack, DoublyLinkedList, LinkedBinary, GeneralTree)
+
+# dunder methods that are worth counting; the others (e.g. __repr__) are left alone.
+_DUNDERS = {'__init__', '__len__', '__iter__', '__eq__', '__ne__'}
+
+
+class _Frame:
+    __slots__ = '_key', '_start', '_child_time', '_allocs'
+
+    def __init__(self, key, start):
+        self._key = key
+        self._start = start
+        self._child_time = 0.0
+        self._allocs = 0
+
+
+class Instrumentation:
+    """
+        Collects per-method call counts, cumulative and own time, allocations and
+        traversal steps (positions yielded by generators) for the given classes.
+    """
+
+    def __init__(self, classes=DEFAULT_CLASSES):
+        self._classes = classes
+        self._patched = []  # (owner, name, original)
+        self._stack = []
+        self._stats = {}   # key -> [calls, own time, cumulative time, allocs, steps]
+        self._edges = {}   # (caller key, key) -> [calls, own time, cumulative time]
+        self._codes = {}   # key -> (filename, line number)
+
+    def _targets(self):
+        """
+            Generate (owner, name, function, counts_allocation) for each method to wrap.
+        """
+        seen = set()
+        for cls in self._classes:
+            for owner in cls.__mro__:
+                if owner is object:
+                    continue
+                nested = [(owner, False)]
+                for attr in ('_Node', 'Position'):
+                    inner = owner.__dict__.get(attr)
+                    if isinstance(inner, type):
+                        nested.append((inner, True))
+                for klass, is_alloc in nested:
+                    for name, func in list(klass.__dict__.items()):
+                        if not inspect.isfunction(func) or (klass, name) in seen:
+                            continue
+                        if name.startswith('__') and name not in _DUNDERS:
+                            continue
+                        if is_alloc and name != '__init__':
+                            continue
+                        seen.add((klass, name))
+                        yield klass, name, func, is_alloc
+
+    def _enter(self, key):
+        frame = _Frame(key, time.perf_counter())
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame, steps=0, calls=1):
+        elapsed = time.perf_counter() - frame._start
+        stack = self._stack
+        stack.pop()
+        own = elapsed - frame._child_time
+        stats = self._stats.get(frame._key)
+        if stats is None:
+            stats = self._stats[frame._key] = [0, 0.0, 0.0, 0, 0]
+        stats[0] += calls
+        stats[1] += own
+        stats[2] += elapsed
+        stats[3] += frame._allocs
+        stats[4] += steps
+        if stack:
+            parent = stack[-1]
+            parent._child_time += elapsed
+            parent._allocs += frame._allocs
+            edge = self._edges.get((parent._key, frame._key))
+            if edge is None:
+                edge = self._edges[(parent._key, frame._key)] = [0, 0.0, 0.0]
+            edge[0] += calls
+            edge[1] += own
+            edge[2] += elapsed
+
+    def _wrap(self, key, func, is_alloc):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                gen = func(*args, **kwargs)
+                calls = 1
+                while True:
+                    # every resumption is timed, but only the first counts as a call;
+                    # each yielded value is a step.
+                    frame = self._enter(key)
+                    try:
+                        value = next(gen)
+                    except StopIteration:
+                        self._exit(frame, 0, calls)
+                        return
+                    except BaseException:
+                        self._exit(frame, 0, calls)
+                        raise
+                    self._exit(frame, 1, calls)
+                    calls = 0
+                    yield value
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                frame = self._enter(key)
+                if is_alloc:
+                    frame._allocs += 1
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._exit(frame)
+        return wrapper
+
+    def enable(self):
+        """
+            Replace the methods of the instrumented classes by counting wrappers.
+        """
+        if self._patched:
+            raise ValueError("Instrumentation is already enabled!")
+        for owner, name, func, is_alloc in list(self._targets()):
+            key = func.__qualname__
+            self._codes[key] = (func.__code__.co_filename, func.__code__.co_firstlineno)
+            self._patched.append((owner, name, func))
+            setattr(owner, name, self._wrap(key, func, is_alloc))
+
+    def disable(self):
+        """
+            Restore the original methods.
+        """
+        for owner, name, func in reversed(self._patched):
+            setattr(owner, name, func)
+        self._patched = []
+        self._stack = []
+
+    def is_enabled(self):
+        return bool(self._patched)
+
+    def reset(self):
+        """
+            Forget the statistics collected so far.
+        """
+        self._stats = {}
+        self._edges = {}
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def stats(self):
+        """
+            Returns a dictionary from 'Class.method' to its calls, own and cumulative time,
+            allocations (including those of the methods it called) and traversal steps.
+        """
+        return {key: {'calls': s[0], 'own_time': s[1], 'cumulative_time': s[2],
+                      'allocations': s[3], 'steps': s[4]}
+                for key, s in self._stats.items()}
+
+    def report(self, sort='cumulative_time', limit=None):
+        """
+            Returns a table of the statistics, sorted by the given column.
+        """
+        rows = sorted(self.stats().items(), key=lambda item: item[1][sort], reverse=True)
+        lines = [f"{'method':44} {'calls':>10} {'own s':>10} {'cum s':>10} {'allocs':>10} {'steps':>10}"]
+        for key, s in rows[:limit]:
+            lines.append(f"{key:44} {s['calls']:10} {s['own_time']:10.4f} {s['cumulative_time']:10.4f}"
+                         f" {s['allocations']:10} {s['steps']:10}")
+        return '\n'.join(lines)
+
+    def to_json(self, path):
+        """
+            Write the statistics to path as JSON.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2, sort_keys=True)
+
+    def _pstats_key(self, key):
+        filename, line = self._codes[key]
+        return filename, line, key
+
+    def dump_stats(self, path):
+        """
+            Write the statistics to path in the format read by pstats.Stats(path).
+        """
+        stats = {}
+        for key, s in self._stats.items():
+            stats[self._pstats_key(key)] = (s[0], s[0], s[1], s[2], {})
+        for (caller, callee), e in self._edges.items():
+            stats[self._pstats_key(callee)][4][self._pstats_key(caller)] = (e[0], e[0], e[1], e[2])
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)
+
+
+def instrument(*classes):
+    """
+        Returns an Instrumentation of classes (by default all the structures), for use as a context manager.
+    """
+    return Instrumentation(classes or DEFAULT_CLASSES)
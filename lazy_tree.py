@@ -0,0 +1,216 @@
+"""
+    Read-only GeneralTree over a file in the parenthetic format read by parse_parenthetic,
+    whose nodes are read from the file only when they are visited.
+"""
+import mmap
+import os
+import re
+import sys
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from trees import GeneralTree
+
+_DELIMITER = re.compile(rb'[(),]')
+
+
+def index_path_for(path):
+    return path + '.idx'
+
+
+def build_index(path, index_path=None):
+    """
+        Scan the parenthetic file at path once and write the offsets of its matching
+        parentheses, with the number of nodes, to index_path (path + '.idx' by default).
+    """
+    index_path = index_path or index_path_for(path)
+    if os.path.getsize(path) == 0:  # mmap cannot map an empty file
+        raise ValueError(f"{path} is empty and holds no tree!")
+    opens = array('q')
+    closes = array('q')
+    stack = []
+    commas = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for m in _DELIMITER.finditer(mm):
+            c = mm[m.start()]
+            if c == 0x28:  # (
+                stack.append(len(opens))
+                opens.append(m.start())
+                closes.append(-1)
+            elif c == 0x29:  # )
+                if not stack:
+                    raise ValueError(f"Unbalanced ')' at byte {m.start()}!")
+                closes[stack.pop()] = m.start()
+            else:
+                commas += 1
+    if stack:
+        raise ValueError("Unbalanced '('!")
+
+    st = os.stat(path)
+    header = array('q', [st.st_size, st.st_mtime_ns, len(opens), 1 + len(opens) + commas])
+    with open(index_path, 'wb') as f:
+        header.tofile(f)
+        opens.tofile(f)
+        closes.tofile(f)
+    return index_path
+
+
+def _load_index(path, index_path):
+    """
+        Returns (opens, closes, number of nodes), or None if the index is missing or out of date.
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            header = array('q')
+            header.fromfile(f, 4)
+            st = os.stat(path)
+            if header[0] != st.st_size or header[1] != st.st_mtime_ns:
+                return None
+            opens = array('q')
+            opens.fromfile(f, header[2])
+            closes = array('q')
+            closes.fromfile(f, header[2])
+    except (OSError, EOFError):
+        return None
+    return opens, closes, header[3]
+
+
+class LazyGeneralTree(GeneralTree):
+    """
+        GeneralTree whose element and children of a node are read from the file on first use.
+
+        Startup only loads the parenthesis index (built once and kept next to the file), and at
+        most max_resident nodes keep their element and children; the least recently used ones
+        are dropped and read again when needed. The tree cannot be modified.
+    """
+
+    class _Node:
+        __slots__ = "_element", "_parent", "_children", "_offset", "__weakref__"
+
+        def __init__(self, element, parent, children, offset=0):
+            self._element = element
+            self._parent = parent
+            self._children = children  # tuple of child nodes once loaded, None before
+            self._offset = offset
+
+    class Position(GeneralTree.Position):
+
+        def element(self):
+            return self._container._load(self._node)._element
+
+    def __init__(self, path, max_resident=100000, index_path=None):
+        super().__init__()
+        index_path = index_path or index_path_for(path)
+        index = _load_index(path, index_path)
+        if index is None:
+            build_index(path, index_path)
+            index = _load_index(path, index_path)
+        self._opens, self._closes, self._size = index
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._max_resident = max_resident
+        self._resident = OrderedDict()                 # offset -> loaded node, least recent first
+        self._nodes = weakref.WeakValueDictionary()    # offset -> node, while referenced
+        self._root = self._node_at(0, None)
+
+    def close(self):
+        self._resident.clear()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _node_at(self, offset, parent):
+        """
+            Returns the node whose token starts at offset, reusing it if it is still referenced.
+        """
+        node = self._nodes.get(offset)
+        if node is None:
+            node = self._nodes[offset] = self._Node(None, parent, None, offset)
+        return node
+
+    def _match(self, offset):
+        """
+            Returns the offset of the ')' matching the '(' at offset.
+        """
+        return self._closes[bisect_left(self._opens, offset)]
+
+    def _load(self, node):
+        """
+            Read the element and the children of node from the file if they are not resident.
+        """
+        resident = self._resident
+        if node._children is not None:
+            resident.move_to_end(node._offset)
+            return node
+
+        mm = self._mm
+        m = _DELIMITER.search(mm, node._offset)
+        end = m.start() if m else len(mm)
+        node._element = mm[node._offset:end].decode('utf-8')
+        children = []
+        if m and mm[end] == 0x28:  # (
+            close = self._match(end)
+            start = end + 1
+            while start < close:
+                children.append(self._node_at(start, node))
+                m = _DELIMITER.search(mm, start)
+                if mm[m.start()] == 0x28:
+                    # skip the child's subtree, up to the delimiter after its ')'
+                    m = _DELIMITER.search(mm, self._match(m.start()) + 1)
+                start = m.start() + 1
+        node._children = tuple(children)
+
+        resident[node._offset] = node
+        while len(resident) > self._max_resident:
+            _, old = resident.popitem(last=False)
+            old._element = old._children = None
+        return node
+
+    def resident(self):
+        """
+            Returns the number of nodes whose element and children are in memory.
+        """
+        return len(self._resident)
+
+    def _child_nodes(self, node):
+        return iter(self._load(node)._children)
+
+    def _node_footprint(self, node):
+        """
+            Returns the number of bytes used by node and its tuple of children once loaded.
+        """
+        return sys.getsizeof(node) + sys.getsizeof(self._load(node)._children)
+
+    def num_children(self, p):
+        return len(self._load(self._validate(p))._children)
+
+    def children(self, p):
+        node = self._load(self._validate(p))
+        for c in node._children:
+            yield self._make_position(c)
+
+    def first(self, p):
+        children = self._load(self._validate(p))._children
+        return self._make_position(children[0]) if children else None
+
+    def last(self, p):
+        children = self._load(self._validate(p))._children
+        return self._make_position(children[-1]) if children else None
+
+    def _read_only(self, *args):
+        raise ValueError("A LazyGeneralTree cannot be modified!")
+
+    add_root = insert_first = insert_last = delete_first = delete_last = _read_only
+    replace = set_element = parse_parenthetic = prune = detach = _read_only
+    from_parent_array = from_edges = _read_only
+
+    def cursor(self, p=None):
+        raise ValueError("A LazyGeneralTree has no cursor; use positions.")
@@ -95,6 +95,64 @@ class CircularLinkedList:
     pass
 
 
+def _merge_chains(a, b, reverse, dummy):
+    """
+        Merge the sorted chains of nodes a and b, linked by _next and holding their keys in
+        _prev, after dummy, and return the first node. Ties are taken from a first.
+        If a comparison fails, the rest of a and then of b are linked after the merged part.
+    """
+    tail = dummy
+    try:
+        if reverse:
+            while a is not None and b is not None:
+                if a._prev < b._prev:
+                    tail._next = b
+                    tail = b
+                    b = b._next
+                else:
+                    tail._next = a
+                    tail = a
+                    a = a._next
+        else:
+            while a is not None and b is not None:
+                if b._prev < a._prev:
+                    tail._next = b
+                    tail = b
+                    b = b._next
+                else:
+                    tail._next = a
+                    tail = a
+                    a = a._next
+    finally:
+        if a is None:
+            tail._next = b
+        else:
+            tail._next = a
+            if b is not None:
+                while a._next is not None:
+                    a = a._next
+                a._next = b
+    return dummy._next
+
+
+def _gather(heads):
+    """
+        Link every node reachable from the chains heads into one chain, each node once, and
+        return its first node. Used to recover all the nodes when a sort fails half way.
+    """
+    seen = set()
+    nodes = []
+    for node in heads:
+        while node is not None:
+            if node not in seen:
+                seen.add(node)
+                nodes.append(node)
+            node = node._next
+    for node, successor in zip(nodes, nodes[1:] + [None]):
+        node._next = successor
+    return nodes[0] if nodes else None
+
+
 class DoublyLinkedList:
     """
         The implementation for a positional doubly linked list.
@@ -113,6 +171,7 @@ class DoublyLinkedList:
         def __init__(self, container, node):
             self._container = container
             self._node = node
+            self._generation = container._generation
 
         def __eq__(self, other):
             return type(self) == type(other) and self._node is other._node
@@ -133,7 +192,7 @@ class DoublyLinkedList:
         if p._container is not self:
             raise ValueError(f"{p} must be an instance of {self}!")
 
-        if p._node._next is None:
+        if p._node._next is None or p._generation != self._generation:
             raise ValueError(f"{p} is a deprecated position!")
 
         return p._node
@@ -149,6 +208,8 @@ class DoublyLinkedList:
         self._header._next = self._trailer
         self._trailer._prev = self._header
         self._size = 0
+        self._version = 0  # changed by every structural update
+        self._generation = 0  # changed when merge moves all the nodes to another list
 
     def __repr__(self):
         return "DoublyLinkedList"
@@ -201,11 +262,24 @@ class DoublyLinkedList:
         """
             Inserts element e between predecessor and successor, and return the position of the new node.
         """
+        return self._make_position(self._link_between(e, predecessor, successor))
+
+    def _link_between(self, e, predecessor, successor):
+        """
+            Inserts element e between predecessor and successor, and return the new node.
+        """
         node = self._Node(e, predecessor, successor)
         predecessor._next = node
         successor._prev = node
         self._size += 1
-        return self._make_position(node)
+        self._version += 1
+        return node
+
+    def _append(self, e):
+        """
+            Insert e at the end of the list without creating a position.
+        """
+        self._link_between(e, self._trailer._prev, self._trailer)
 
     def insert_first(self, e):
         """
@@ -220,16 +294,16 @@ class DoublyLinkedList:
         """
         return self.insert_between(e, self._trailer._prev, self._trailer)
 
-    def _delete_node(self, p):
+    def _delete_node(self, node):
         """
-           Deletes node at position p, and returns the element.
+           Deletes node, and returns the element.
         """
-        node = self._validate(p)
         predecessor = node._prev
         successor = node._next
         predecessor._next = successor
         successor._prev = predecessor
         self._size -= 1
+        self._version += 1
         element = node._element
         node._prev = node._element = node._next = None  # deleted node
         return element
@@ -255,11 +329,225 @@ class DoublyLinkedList:
         Replace the element at Position p with e.
         Return the element formerly at Position p.
         """
-        original = self.validate(p)
+        original = self._validate(p)
         old_value = original._element
         # temporarily store old element
         original._element = e
         # replace with new element
         return old_value
- 
+
+    def _detach_nodes(self):
+        """
+            Unlink all nodes from the sentinels and return the first, or None if the list is
+            empty; the nodes stay linked to each other by _next, the last one to None.
+        """
+        if self._size == 0:
+            return None
+        first = self._header._next
+        self._trailer._prev._next = None
+        self._header._next = self._trailer
+        self._trailer._prev = self._header
+        return first
+
+    def _relink(self, first):
+        """
+            Put the chain of nodes starting at first between the sentinels, restoring their _prev links.
+        """
+        prev = self._header
+        node = first
+        while node is not None:
+            prev._next = node
+            node._prev = prev
+            prev = node
+            node = node._next
+        prev._next = self._trailer
+        self._trailer._prev = prev
+        self._version += 1
+
+    @staticmethod
+    def _store_keys(node, key):
+        """
+            Store the key of every node of the chain in its _prev link, which sorting does not need.
+        """
+        while node is not None:
+            node._prev = node._element if key is None else key(node._element)
+            node = node._next
+
+    def sort(self, key=None, reverse=False):
+        """
+            Sort the list in place, stably, as list.sort would.
+
+            The existing nodes are relinked, so every position stays valid and keeps its element,
+            and no memory is allocated per element. Natural runs are merged bottom-up, so an
+            already sorted list takes one pass. If key or a comparison raises an error, the list
+            keeps all its elements in some order.
+        """
+        if self._size < 2:
+            return
+        first = rest = self._detach_nodes()
+        dummy = self._Node(None, None, None)
+        runs = []     # runs[i] is None or a sorted chain built from about 2 ** i runs
+        carry = None
+        try:
+            self._store_keys(first, key)
+            while rest is not None:
+                # cut the longest run at the front of rest that is already in order
+                node = rest
+                if reverse:
+                    while node._next is not None and not node._prev < node._next._prev:
+                        node = node._next
+                else:
+                    while node._next is not None and not node._next._prev < node._prev:
+                        node = node._next
+                carry, rest = rest, node._next
+                node._next = None
+                i = 0
+                while i < len(runs) and runs[i] is not None:
+                    carry = _merge_chains(runs[i], carry, reverse, dummy)
+                    runs[i] = None
+                    i += 1
+                if i == len(runs):
+                    runs.append(carry)
+                else:
+                    runs[i] = carry
+                carry = None
+            for i in range(len(runs)):
+                if runs[i] is not None:
+                    carry = runs[i] if carry is None else _merge_chains(runs[i], carry, reverse, dummy)
+                    runs[i] = None
+            first = carry
+        except BaseException:
+            first = _gather([dummy._next, carry, rest] + runs)
+            raise
+        finally:
+            self._relink(first)
+
+    def merge(self, other, key=None, reverse=False):
+        """
+            Move the elements of the list other, sorted like this list, into this list so that
+            it stays sorted; ties keep the elements of this list first. other is left empty.
+
+            The nodes are relinked, so positions in this list stay valid; positions of other
+            become invalid.
+        """
+        if not isinstance(other, DoublyLinkedList):
+            raise ValueError(f"{other} must be an instance of {DoublyLinkedList}!")
+        if other is self:
+            raise ValueError("A list cannot be merged with itself!")
+        if other.is_empty():
+            return
+        moved = other._size
+        b = other._detach_nodes()
+        other._size = 0
+        other._version += 1
+        other._generation += 1
+        a = first = self._detach_nodes()
+        dummy = self._Node(None, None, None)
+        try:
+            self._store_keys(a, key)
+            self._store_keys(b, key)
+            first = _merge_chains(a, b, reverse, dummy)
+        except BaseException:
+            first = _gather([dummy._next, a, b])
+            raise
+        finally:
+            self._size += moved
+            self._relink(first)
+
+    def cursor(self, p=None):
+        """
+            Returns a ListCursor at position p, or at the first element if p is None.
+        """
+        return ListCursor(self, p)
+
+
+class ListCursor:
+    """
+        A movable reference into a DoublyLinkedList. Moving the cursor updates it in place
+        instead of creating a new Position, and any structural change of the list since the
+        cursor was created or synced makes it stale.
+    """
+
+    __slots__ = "_list", "_node", "_version", "_generation"
+
+    def __init__(self, container, p=None):
+        self._list = container
+        if p is not None:
+            self._node = container._validate(p)
+        elif not container.is_empty():
+            self._node = container._header._next
+        else:
+            raise ValueError("Empty List!")
+        self._version = container._version
+        self._generation = container._generation
+
+    def _check(self):
+        if self._version != self._list._version:
+            raise ValueError("The list has changed since the cursor was created!")
+        return self._node
+
+    def is_valid(self):
+        """
+            Returns True if the list has not changed since the cursor was created or synced.
+        """
+        return self._version == self._list._version
+
+    def sync(self):
+        """
+            Accept the changes made to the list since the cursor was created; raise an error
+            if the element under the cursor was deleted.
+        """
+        if self._node._next is None:
+            raise ValueError("The element under the cursor was deleted!")
+        if self._list._generation != self._generation:
+            raise ValueError("The element under the cursor was moved to another list!")
+        self._version = self._list._version
+
+    def element(self):
+        return self._check()._element
+
+    def replace(self, e):
+        """
+            Replace the element under the cursor with e, and return the previous element.
+        """
+        node = self._check()
+        old_value = node._element
+        node._element = e
+        return old_value
+
+    def position(self):
+        """
+            Returns a Position of the element under the cursor.
+        """
+        return self._list._make_position(self._check())
+
+    def to_first(self):
+        self._check()
+        self._node = self._list._header._next
+        return self._node is not self._list._trailer
+
+    def to_last(self):
+        self._check()
+        self._node = self._list._trailer._prev
+        return self._node is not self._list._header
+
+    def to_next(self):
+        """
+            Move to the next element and return True, or return False if the cursor is at the last element.
+        """
+        node = self._check()._next
+        if node._next is None:  # trailer
+            return False
+        self._node = node
+        return True
+
+    def to_prev(self):
+        """
+            Move to the previous element and return True, or return False if the cursor is at the first element.
+        """
+        node = self._check()._prev
+        if node._prev is None:  # header
+            return False
+        self._node = node
+        return True
 
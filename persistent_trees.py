@@ -0,0 +1,346 @@
+"""
+    Persistent (immutable) binary and general trees.
+
+    Every update returns a new version of the tree that shares all the nodes off the updated
+    path with the previous version, which stays valid and unchanged. Nodes have no parent
+    pointers; a position remembers the position of its parent instead.
+"""
+import threading
+
+from trees import Tree, BinaryTree
+
+
+class _PersistentPosition(Tree.Position):
+    """
+        Position in one version of a persistent tree; the index is the slot of the node
+        in its parent (0 left and 1 right in a binary tree, the child index in a general tree).
+    """
+
+    def __init__(self, container, node, parent, index):
+        self._container = container
+        self._node = node
+        self._parent = parent
+        self._index = index
+
+    def element(self):
+        return self._node._element
+
+    def __eq__(self, other):
+        """
+            returns True if other is a position representing the same location.
+        """
+        return (type(self) == type(other) and self._node is other._node
+                and self._parent == other._parent)
+
+
+class PersistentBinaryTree(BinaryTree):
+
+    class _Node:
+        __slots__ = '_element', '_left', '_right', '_size'
+
+        def __init__(self, element, left=None, right=None):
+            self._element = element
+            self._left = left
+            self._right = right
+            self._size = 1 + (left._size if left else 0) + (right._size if right else 0)
+
+    class Position(_PersistentPosition):
+        pass
+
+    def __init__(self, root=None):
+        self._root = root
+
+    def _validate(self, p):
+        """ Raise error if p is not a position of this version, otherwise return its node. """
+
+        if not isinstance(p, self.Position):
+            raise ValueError(" p is not instance not Position class. ")
+        if p._container is not self:
+            raise ValueError("p doesn't belong the this version of the tree. ")
+        return p._node
+
+    def __len__(self):
+        return self._root._size if self._root is not None else 0
+
+    def snapshot(self):
+        """
+            Returns this version; it never changes, so it can be read without locking.
+        """
+        return self
+
+    def root(self):
+        return self.Position(self, self._root, None, None) if self._root is not None else None
+
+    def parent(self, p):
+        self._validate(p)
+        return p._parent
+
+    def left(self, p):
+        node = self._validate(p)
+        return self.Position(self, node._left, p, 0) if node._left is not None else None
+
+    def right(self, p):
+        node = self._validate(p)
+        return self.Position(self, node._right, p, 1) if node._right is not None else None
+
+    def num_children(self, p):
+        node = self._validate(p)
+        return (node._left is not None) + (node._right is not None)
+
+    def _path_copy(self, p, node):
+        """
+            Returns a new version in which the node at position p is replaced by node
+            (None removes it), copying only the ancestors of p.
+        """
+        while p._parent is not None:
+            parent = p._parent._node
+            if p._index == 0:
+                node = self._Node(parent._element, node, parent._right)
+            else:
+                node = self._Node(parent._element, parent._left, node)
+            p = p._parent
+        return type(self)(node)
+
+    def add_root(self, e):
+        """
+            Returns a version with a root storing e; an error occurs if the tree is not empty.
+        """
+        if self._root is not None:
+            raise ValueError(" The tree is not empty! ")
+        return type(self)(self._Node(e))
+
+    def add_left(self, p, e):
+        """
+            Returns a version in which p has a new left child storing e; an error occurs if p already has one.
+        """
+        node = self._validate(p)
+        if node._left is not None:
+            raise ValueError("p already has a left child! ")
+        return self._path_copy(p, self._Node(node._element, self._Node(e), node._right))
+
+    def add_right(self, p, e):
+        """
+            Returns a version in which p has a new right child storing e; an error occurs if p already has one.
+        """
+        node = self._validate(p)
+        if node._right is not None:
+            raise ValueError("p already has right child! ")
+        return self._path_copy(p, self._Node(node._element, node._left, self._Node(e)))
+
+    def replace(self, p, e):
+        """
+            Returns a version in which p stores e.
+        """
+        node = self._validate(p)
+        return self._path_copy(p, self._Node(e, node._left, node._right))
+
+    def delete(self, p):
+        """
+            Returns a version without the node at p, replaced by its child; an error occurs if p has two children.
+        """
+        node = self._validate(p)
+        if node._left is not None and node._right is not None:
+            raise ValueError("p has two children! ")
+        child = node._left if node._left is not None else node._right
+        return self._path_copy(p, child)
+
+    def attach(self, p, t1, t2):
+        """
+            Returns a version in which the versions t1 and t2 are the left and right subtrees of the leaf p.
+        """
+        node = self._validate(p)
+        if node._left is not None or node._right is not None:
+            raise ValueError("p must be a leaf node! ")
+        if not type(self) is type(t1) is type(t2):
+            raise ValueError("All trees must be of the same type. ")
+        return self._path_copy(p, self._Node(node._element, t1._root, t2._root))
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+            Returns a persistent copy of the LinkedBinary tree.
+        """
+        def copy(node):
+            if node is None:
+                return None
+            return cls._Node(node._element, copy(node._left), copy(node._right))
+        return cls(copy(tree._root))
+
+    def positions(self):
+        for p in self.preorder():
+            yield p
+
+    def __iter__(self):
+        for p in self.positions():
+            yield p.element()
+
+
+class PersistentGeneralTree(Tree):
+
+    class _Node:
+        __slots__ = '_element', '_children', '_size'
+
+        def __init__(self, element, children=()):
+            self._element = element
+            self._children = children  # tuple of nodes
+            self._size = 1 + sum(c._size for c in children)
+
+    class Position(_PersistentPosition):
+        pass
+
+    def __init__(self, root=None):
+        self._root = root
+
+    def _validate(self, p):
+        """ Raise error if p is not a position of this version, otherwise return its node. """
+
+        if not isinstance(p, self.Position):
+            raise ValueError(" p is not instance not Position class. ")
+        if p._container is not self:
+            raise ValueError("p doesn't belong the this version of the tree. ")
+        return p._node
+
+    def __len__(self):
+        return self._root._size if self._root is not None else 0
+
+    def snapshot(self):
+        """
+            Returns this version; it never changes, so it can be read without locking.
+        """
+        return self
+
+    def root(self):
+        return self.Position(self, self._root, None, None) if self._root is not None else None
+
+    def parent(self, p):
+        self._validate(p)
+        return p._parent
+
+    def num_children(self, p):
+        return len(self._validate(p)._children)
+
+    def children(self, p):
+        node = self._validate(p)
+        for i, c in enumerate(node._children):
+            yield self.Position(self, c, p, i)
+
+    def first(self, p):
+        children = self._validate(p)._children
+        return self.Position(self, children[0], p, 0) if children else None
+
+    def last(self, p):
+        children = self._validate(p)._children
+        return self.Position(self, children[-1], p, len(children) - 1) if children else None
+
+    def _path_copy(self, p, node):
+        """
+            Returns a new version in which the node at position p is replaced by node,
+            copying only the ancestors of p.
+        """
+        while p._parent is not None:
+            parent = p._parent._node
+            children = parent._children
+            node = self._Node(parent._element, children[:p._index] + (node,) + children[p._index + 1:])
+            p = p._parent
+        return type(self)(node)
+
+    def add_root(self, e):
+        """
+            Returns a version with a root storing e; an error occurs if the tree is not empty.
+        """
+        if self._root is not None:
+            raise ValueError(" Tree is not empty! ")
+        return type(self)(self._Node(e))
+
+    def replace(self, p, e):
+        """
+            Returns a version in which p stores e.
+        """
+        node = self._validate(p)
+        return self._path_copy(p, self._Node(e, node._children))
+
+    def insert_first(self, e, p):
+        """
+            Returns a version in which e is the first child of p.
+        """
+        node = self._validate(p)
+        return self._path_copy(p, self._Node(node._element, (self._Node(e),) + node._children))
+
+    def insert_last(self, e, p):
+        """
+            Returns a version in which e is the last child of p.
+        """
+        node = self._validate(p)
+        return self._path_copy(p, self._Node(node._element, node._children + (self._Node(e),)))
+
+    def delete_first(self, p):
+        """
+            Returns a version without the first child of p (and its subtree); raise an error if p has no children.
+        """
+        node = self._validate(p)
+        if not node._children:
+            raise ValueError("p has no children.")
+        return self._path_copy(p, self._Node(node._element, node._children[1:]))
+
+    def delete_last(self, p):
+        """
+            Returns a version without the last child of p (and its subtree); raise an error if p has no children.
+        """
+        node = self._validate(p)
+        if not node._children:
+            raise ValueError("p has no children.")
+        return self._path_copy(p, self._Node(node._element, node._children[:-1]))
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+            Returns a persistent copy of the GeneralTree tree.
+        """
+        def copy(node):
+            return cls._Node(node._element, tuple(copy(c) for c in tree._child_nodes(node)))
+        return cls(copy(tree._root) if tree._root is not None else None)
+
+    def positions(self):
+        for p in self.preorder():
+            yield p
+
+    def _subtree_parenthetic(self, node):
+        result = str(node._element)
+        if node._children:
+            result += ' (' + ', '.join(self._subtree_parenthetic(c) for c in node._children) + ')'
+        return result
+
+    def parenthetic(self):
+        """
+            Returns a parenthetic representation of a tree.
+        """
+        if not self.is_empty():
+            return self._subtree_parenthetic(self._root)
+        return ""
+
+
+class VersionedTree:
+    """
+        Holds the current version of a persistent tree for a writer and any number of readers.
+
+        Readers take snapshot() and traverse it without locking; writers publish new versions
+        with update(), which is serialized so that no update is lost.
+    """
+
+    def __init__(self, tree):
+        self._current = tree
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+            Returns the current version in O(1).
+        """
+        return self._current
+
+    def update(self, change, *args):
+        """
+            Publish change(current version, *args) as the current version, and return it.
+        """
+        with self._lock:
+            self._current = change(self._current, *args)
+            return self._current
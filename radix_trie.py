@@ -0,0 +1,321 @@
+"""
+    Compressed radix (Patricia) trie of string keys, built on the Tree position model.
+"""
+from trees import Tree, _gc_paused
+
+_NO_VALUE = object()  # marks a node that does not end a key
+
+
+def _common_prefix_length(a, b, start):
+    """
+        Returns the length of the common prefix of a and b[start:].
+    """
+    n = min(len(a), len(b) - start)
+    i = 0
+    while i < n and a[i] == b[start + i]:
+        i += 1
+    return i
+
+
+class RadixTrie(Tree):
+    """
+        Map from string keys to values in which every edge is labelled with a string and
+        no node without a value has a single child.
+
+        A position is a node of the trie; its element is the value stored for the key that
+        ends at the node, or None. len() is the number of keys.
+    """
+
+    class _Node:
+        __slots__ = "_label", "_value", "_parent", "_children"
+
+        def __init__(self, label, parent, value=_NO_VALUE):
+            self._label = label        # label of the edge from the parent
+            self._value = value
+            self._parent = parent
+            self._children = {}        # first character of the child's label -> child
+
+    class Position(Tree.Position):
+
+        def __init__(self, container, node):
+            self._container = container
+            self._node = node
+
+        def element(self):
+            value = self._node._value
+            return None if value is _NO_VALUE else value
+
+        def key(self):
+            """
+                Returns the key that ends at this position.
+            """
+            labels = []
+            node = self._node
+            while node is not None:
+                labels.append(node._label)
+                node = node._parent
+            return ''.join(reversed(labels))
+
+        def __eq__(self, other):
+            """
+                returns True if other is a position representing the same location.
+            """
+            return type(self) == type(other) and self._node is other._node
+
+    def _validate(self, p):
+        """ Raise error if p is not a valid position otherwise return the node at position p. """
+
+        if not isinstance(p, self.Position):
+            raise ValueError(" p is not instance not Position class. ")
+        if p._container is not self:
+            raise ValueError("p doesn't belong the this tree. ")
+        if p._node._parent is p._node:
+            raise ValueError("p is a deprecated node. ")
+        return p._node
+
+    def _make_position(self, node):
+        return self.Position(self, node) if node is not None else None
+
+    def __init__(self):
+        self._root = self._Node('', None)
+        self._size = 0
+        self._nodes = 1
+
+    def __len__(self):
+        """
+            Returns the number of keys.
+        """
+        return self._size
+
+    def num_nodes(self):
+        return self._nodes
+
+    def root(self):
+        return self._make_position(self._root)
+
+    def parent(self, p):
+        node = self._validate(p)
+        return self._make_position(node._parent)
+
+    def num_children(self, p):
+        return len(self._validate(p)._children)
+
+    def children(self, p):
+        """
+            Generate the positions of the children of p, in the order of their labels.
+        """
+        node = self._validate(p)
+        for c in sorted(node._children):
+            yield self._make_position(node._children[c])
+
+    def _subtree_preorder(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            children = node._children
+            stack.extend(children[c] for c in sorted(children, reverse=True))
+
+    def preorder(self):
+        """
+            Generate a preorder iteration of all positions, so keys come in sorted order.
+        """
+        for node in self._subtree_preorder(self._root):
+            yield self._make_position(node)
+
+    def positions(self):
+        for p in self.preorder():
+            yield p
+
+    def _find_node(self, key):
+        """
+            Returns the node at which key ends, or None if no edge path spells key.
+        """
+        node = self._root
+        i = 0
+        while i < len(key):
+            child = node._children.get(key[i])
+            if child is None or not key.startswith(child._label, i):
+                return None
+            i += len(child._label)
+            node = child
+        return node
+
+    def insert(self, key, value=None):
+        """
+            Store value for key, replacing any previous value, and return the position of key.
+        """
+        node = self._root
+        i = 0
+        while i < len(key):
+            child = node._children.get(key[i])
+            if child is None:
+                child = node._children[key[i]] = self._Node(key[i:], node)
+                self._nodes += 1
+                node = child
+                break
+            label = child._label
+            j = _common_prefix_length(label, key, i)
+            if j < len(label):
+                # split the edge to child after its first j characters
+                middle = node._children[key[i]] = self._Node(label[:j], node)
+                child._label = label[j:]
+                child._parent = middle
+                middle._children[label[j]] = child
+                self._nodes += 1
+                child = middle
+            node = child
+            i += j
+        if node._value is _NO_VALUE:
+            self._size += 1
+        node._value = value
+        return self._make_position(node)
+
+    def __contains__(self, key):
+        node = self._find_node(key)
+        return node is not None and node._value is not _NO_VALUE
+
+    def find(self, key):
+        """
+            Returns the position of key, or None if key is not stored.
+        """
+        node = self._find_node(key)
+        return self._make_position(node) if node is not None and node._value is not _NO_VALUE else None
+
+    def lookup(self, key):
+        """
+            Returns the value stored for key; raise an error if key is not stored.
+        """
+        node = self._find_node(key)
+        if node is None or node._value is _NO_VALUE:
+            raise ValueError(f"{key!r} is not in the trie!")
+        return node._value
+
+    def _merge_with_child(self, node):
+        """
+            Replace node, which has no value and a single child, by that child.
+        """
+        (child,) = node._children.values()
+        parent = node._parent
+        child._label = node._label + child._label
+        child._parent = parent
+        parent._children[child._label[0]] = child
+        node._parent = node  # Convention for a deleted node.
+        self._nodes -= 1
+
+    def delete(self, key):
+        """
+            Remove key and return its value; raise an error if key is not stored.
+        """
+        node = self._find_node(key)
+        if node is None or node._value is _NO_VALUE:
+            raise ValueError(f"{key!r} is not in the trie!")
+        value = node._value
+        node._value = _NO_VALUE
+        self._size -= 1
+        if node is self._root:
+            return value
+
+        if not node._children:
+            parent = node._parent
+            del parent._children[node._label[0]]
+            node._parent = node  # Convention for a deleted node.
+            self._nodes -= 1
+            if parent is not self._root and parent._value is _NO_VALUE and len(parent._children) == 1:
+                self._merge_with_child(parent)
+        elif len(node._children) == 1:
+            self._merge_with_child(node)
+        return value
+
+    def longest_prefix_match(self, s):
+        """
+            Returns (key, value) for the longest stored key that is a prefix of s, or None.
+        """
+        node = self._root
+        best = (0, node) if node._value is not _NO_VALUE else None
+        i = 0
+        while i < len(s):
+            child = node._children.get(s[i])
+            if child is None or not s.startswith(child._label, i):
+                break
+            i += len(child._label)
+            node = child
+            if node._value is not _NO_VALUE:
+                best = (i, node)
+        if best is None:
+            return None
+        return s[:best[0]], best[1]._value
+
+    def items(self, prefix=''):
+        """
+            Generate (key, value) pairs, in sorted order of keys, of the keys starting with prefix.
+        """
+        node = self._root
+        i = 0
+        while i < len(prefix):
+            child = node._children.get(prefix[i])
+            if child is None:
+                return
+            label = child._label
+            j = _common_prefix_length(label, prefix, i)
+            if j < len(label) and i + j < len(prefix):
+                return  # prefix leaves the edge before its end
+            i += len(label)
+            node = child
+        base = prefix[:i - len(node._label)] if node is not self._root else ''
+
+        stack = [(node, base)]
+        while stack:
+            node, base = stack.pop()
+            key = base + node._label
+            if node._value is not _NO_VALUE:
+                yield key, node._value
+            children = node._children
+            stack.extend((children[c], key) for c in sorted(children, reverse=True))
+
+    def keys(self, prefix=''):
+        for key, _ in self.items(prefix):
+            yield key
+
+    def __iter__(self):
+        return self.keys()
+
+    @classmethod
+    def from_sorted(cls, items):
+        """
+            Build a trie from (key, value) pairs sorted by key in a single pass, keeping only
+            the rightmost path of the trie open; a repeated key keeps its last value.
+        """
+        trie = cls()
+        Node = cls._Node
+        stack = [(trie._root, 0)]  # rightmost path: (node, length of its key)
+        previous = ''
+        with _gc_paused():
+            for key, value in items:
+                if key < previous:
+                    raise ValueError(f"{key!r} comes after {previous!r}!")
+                lcp = _common_prefix_length(previous, key, 0)
+                child = None
+                while stack[-1][1] > lcp:
+                    child = stack.pop()[0]
+                node, depth = stack[-1]
+                if depth < lcp:
+                    # split the edge to child, which reaches beyond lcp
+                    middle = Node(child._label[:lcp - depth], node)
+                    node._children[middle._label[0]] = middle
+                    child._label = child._label[lcp - depth:]
+                    child._parent = middle
+                    middle._children[child._label[0]] = child
+                    trie._nodes += 1
+                    stack.append((middle, lcp))
+                    node = middle
+                if lcp < len(key):
+                    node = Node(key[lcp:], node)
+                    node._parent._children[key[lcp]] = node
+                    trie._nodes += 1
+                    stack.append((node, len(key)))
+                if node._value is _NO_VALUE:
+                    trie._size += 1
+                node._value = value
+                previous = key
+        return trie
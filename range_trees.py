@@ -0,0 +1,433 @@
+"""
+    Array-backed range query structures over mutable numeric arrays: a segment tree with
+    lazy range updates and a Fenwick (binary indexed) tree.
+
+    Ranges are half-open, lo <= i < hi, as in Python slices.
+"""
+import math
+import numbers
+
+import numpy as np
+
+from trees import BinaryTree
+
+
+class SegmentTree(BinaryTree):
+    """
+        Segment tree keeping the sum, minimum and maximum of every segment, with range
+        addition applied lazily.
+
+        The tree is a perfect binary tree stored in arrays: node 1 is the root and the
+        children of node i are 2i and 2i+1; the leaves are the nodes size..size+n-1.
+        Its nodes can be inspected through the BinaryTree position interface; the
+        element of a position is (lo, hi, sum, min, max) for its segment.
+    """
+
+    class Position(BinaryTree.Position):
+
+        def __init__(self, container, index):
+            self._container = container
+            self._index = index
+
+        def element(self):
+            return self._container._segment(self._index)
+
+        def __eq__(self, other):
+            """
+                returns True if other is a position representing the same location.
+            """
+            return type(self) == type(other) and self._container is other._container and self._index == other._index
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self._n = n = len(values)
+        self._log = max(0, (n - 1).bit_length())
+        self._size = size = 1 << self._log
+        self._build(values)
+        self._lazy = [0.0] * (2 * size)  # pending addition for the children of a node
+
+    def _build(self, values):
+        """
+            Compute every node from the leaf values with one NumPy pass per level.
+        """
+        size = self._size
+        sums = np.zeros(2 * size)
+        mins = np.full(2 * size, np.inf)
+        maxs = np.full(2 * size, -np.inf)
+        counts = np.zeros(2 * size, dtype=np.int64)
+        counts[size:size + self._n] = 1
+        sums[size:size + self._n] = values
+        mins[size:size + self._n] = values
+        maxs[size:size + self._n] = values
+        lo = size
+        while lo > 1:
+            hi, lo = lo, lo // 2
+            counts[lo:hi] = counts[2 * lo:2 * hi:2] + counts[2 * lo + 1:2 * hi:2]
+            sums[lo:hi] = sums[2 * lo:2 * hi:2] + sums[2 * lo + 1:2 * hi:2]
+            mins[lo:hi] = np.minimum(mins[2 * lo:2 * hi:2], mins[2 * lo + 1:2 * hi:2])
+            maxs[lo:hi] = np.maximum(maxs[2 * lo:2 * hi:2], maxs[2 * lo + 1:2 * hi:2])
+        # Python lists are much faster than NumPy arrays for one element at a time.
+        self._count = counts.tolist()
+        self._sum = sums.tolist()
+        self._min = mins.tolist()
+        self._max = maxs.tolist()
+
+    def __len__(self):
+        """
+            Returns the number of elements of the array.
+        """
+        return self._n
+
+    def _bounds(self, i):
+        """
+            Returns the segment [lo, hi) covered by node i.
+        """
+        depth = i.bit_length() - 1
+        width = self._size >> depth
+        lo = (i - (1 << depth)) * width
+        return lo, min(lo + width, self._n)
+
+    def _apply(self, i, delta):
+        """
+            Add delta to every element under node i.
+        """
+        self._sum[i] += delta * self._count[i]
+        self._min[i] += delta
+        self._max[i] += delta
+        if i < self._size:
+            self._lazy[i] += delta
+
+    def _push(self, i):
+        """
+            Pass the pending addition of node i on to its children.
+        """
+        lazy = self._lazy
+        delta = lazy[i]
+        if delta:
+            lazy[i] = 0.0
+            sums, mins, maxs, count = self._sum, self._min, self._max, self._count
+            for c in (2 * i, 2 * i + 1):
+                sums[c] += delta * count[c]
+                mins[c] += delta
+                maxs[c] += delta
+                if c < self._size:
+                    lazy[c] += delta
+
+    def _pull(self, i):
+        left, right = 2 * i, 2 * i + 1
+        self._sum[i] = self._sum[left] + self._sum[right]
+        self._min[i] = min(self._min[left], self._min[right])
+        self._max[i] = max(self._max[left], self._max[right])
+
+    def _check_range(self, lo, hi):
+        if not 0 <= lo <= hi <= self._n:
+            raise ValueError(f"[{lo}, {hi}) is not a range of the array!")
+
+    def _push_boundaries(self, lo, hi):
+        """
+            Push the pending additions down the paths from the root to the leaves lo and hi - 1,
+            the only nodes that can cover [lo, hi) partly.
+        """
+        push = self._push
+        for k in range(self._log, 0, -1):
+            if (lo >> k) << k != lo:
+                push(lo >> k)
+            if (hi >> k) << k != hi:
+                push((hi - 1) >> k)
+
+    def add(self, lo, hi, delta):
+        """
+            Add delta to the elements lo <= i < hi.
+        """
+        self._check_range(lo, hi)
+        if lo == hi:
+            return
+        delta = float(delta)
+        lo += self._size
+        hi += self._size
+        self._push_boundaries(lo, hi)
+        apply = self._apply
+        l, r = lo, hi
+        while l < r:
+            if l & 1:
+                apply(l, delta)
+                l += 1
+            if r & 1:
+                r -= 1
+                apply(r, delta)
+            l >>= 1
+            r >>= 1
+        pull = self._pull
+        for k in range(1, self._log + 1):
+            if (lo >> k) << k != lo:
+                pull(lo >> k)
+            if (hi >> k) << k != hi:
+                pull((hi - 1) >> k)
+
+    def __setitem__(self, index, value):
+        """
+            Set the element at index to value.
+        """
+        if not 0 <= index < self._n:
+            raise ValueError(f"{index} is not an index of the array!")
+        i = index + self._size
+        for k in range(self._log, 0, -1):
+            self._push(i >> k)
+        value = float(value)
+        self._sum[i] = self._min[i] = self._max[i] = value
+        for k in range(1, self._log + 1):
+            self._pull(i >> k)
+
+    def __getitem__(self, index):
+        return self.range_sum(index, index + 1)
+
+    def query(self, lo, hi):
+        """
+            Returns (sum, min, max) of the elements lo <= i < hi; raise an error if the range is empty.
+        """
+        self._check_range(lo, hi)
+        if lo == hi:
+            raise ValueError("The range is empty!")
+        lo += self._size
+        hi += self._size
+        self._push_boundaries(lo, hi)
+        sums, mins, maxs = self._sum, self._min, self._max
+        total, low, high = 0.0, float('inf'), float('-inf')
+        while lo < hi:
+            if lo & 1:
+                total += sums[lo]
+                low = min(low, mins[lo])
+                high = max(high, maxs[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                total += sums[hi]
+                low = min(low, mins[hi])
+                high = max(high, maxs[hi])
+            lo >>= 1
+            hi >>= 1
+        return total, low, high
+
+    def range_sum(self, lo, hi):
+        return self.query(lo, hi)[0] if lo < hi else 0.0
+
+    def range_min(self, lo, hi):
+        return self.query(lo, hi)[1]
+
+    def range_max(self, lo, hi):
+        return self.query(lo, hi)[2]
+
+    def to_array(self):
+        """
+            Returns the current elements as a NumPy array.
+        """
+        for i in range(1, self._size):
+            self._push(i)
+        return np.array(self._sum[self._size:self._size + self._n])
+
+    # batched operations
+
+    def add_many(self, lo, hi, delta):
+        """
+            Apply add(lo[k], hi[k], delta[k]) for every k; delta may be a scalar.
+        """
+        lo, hi, delta = np.broadcast_arrays(np.asarray(lo), np.asarray(hi), np.asarray(delta, dtype=np.float64))
+        for a, b, d in zip(lo.tolist(), hi.tolist(), delta.tolist()):
+            self.add(a, b, d)
+
+    def set_many(self, indices, values):
+        """
+            Set the elements at indices to values.
+
+            A batch large enough to touch most of the tree rebuilds it with NumPy instead.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), indices.shape)
+        if len(indices) * math.log2(self._size + 1) > self._n:
+            array = self.to_array()
+            array[indices] = values
+            self._build(array)
+            self._lazy = [0.0] * (2 * self._size)
+        else:
+            for i, v in zip(indices.tolist(), values.tolist()):
+                self[i] = v
+
+    def query_many(self, lo, hi):
+        """
+            Returns arrays (sums, mins, maxs) of query(lo[k], hi[k]) for every k.
+        """
+        lo, hi = np.broadcast_arrays(np.asarray(lo), np.asarray(hi))
+        results = [self.query(a, b) for a, b in zip(lo.tolist(), hi.tolist())]
+        if not results:
+            return np.zeros(0), np.zeros(0), np.zeros(0)
+        sums, mins, maxs = zip(*results)
+        return np.array(sums), np.array(mins), np.array(maxs)
+
+    # positional interface
+
+    def _segment(self, i):
+        """
+            Returns (lo, hi, sum, min, max) of node i, including the additions still pending above it.
+        """
+        pending = 0.0
+        j = i // 2
+        while j:
+            pending += self._lazy[j]
+            j //= 2
+        lo, hi = self._bounds(i)
+        return lo, hi, self._sum[i] + pending * (hi - lo), self._min[i] + pending, self._max[i] + pending
+
+    def _validate(self, p):
+        if not isinstance(p, self.Position):
+            raise ValueError(" p is not instance not Position class. ")
+        if p._container is not self:
+            raise ValueError("p doesn't belong the this tree. ")
+        return p._index
+
+    def _make_position(self, i):
+        """
+            Returns the position of node i, or None if its segment holds no element.
+        """
+        if i >= 2 * self._size or self._count[i] == 0:
+            return None
+        return self.Position(self, i)
+
+    def root(self):
+        return self._make_position(1) if self._n else None
+
+    def parent(self, p):
+        i = self._validate(p)
+        return self._make_position(i // 2) if i > 1 else None
+
+    def left(self, p):
+        return self._make_position(2 * self._validate(p))
+
+    def right(self, p):
+        return self._make_position(2 * self._validate(p) + 1)
+
+    def num_children(self, p):
+        return sum(1 for _ in self.children(p))
+
+    def positions(self):
+        """
+            Generate the positions of the nodes in breadth-first order.
+        """
+        for i in range(1, 2 * self._size):
+            if self._count[i]:
+                yield self.Position(self, i)
+
+
+class FenwickTree:
+    """
+        Fenwick (binary indexed) tree over a numeric array: O(log n) point updates and
+        prefix or range sums. The batched operations process all their indices together,
+        one NumPy pass per tree level.
+
+        Integer values are summed exactly in int64 until a value that is not an integer is
+        added; the tree then switches to float64.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values)
+        dtype = np.int64 if np.issubdtype(values.dtype, np.integer) else np.float64
+        self._values = values.astype(dtype)
+        self._tree = self._values.copy()
+        n = len(self._tree)
+        # each node passes its partial sum to the next node covering it, level by level.
+        step = 1
+        while step < n:
+            i = np.arange(step - 1, n, 2 * step)
+            j = i + step
+            j = j[j < n]
+            self._tree[j] += self._tree[i[:len(j)]]
+            step *= 2
+
+    def __len__(self):
+        return len(self._tree)
+
+    def __getitem__(self, index):
+        return self._values[index].item()
+
+    def _to_float(self):
+        self._values = self._values.astype(np.float64)
+        self._tree = self._tree.astype(np.float64)
+
+    def add(self, index, delta):
+        """
+            Add delta to the element at index.
+        """
+        n = len(self._tree)
+        if not 0 <= index < n:
+            raise ValueError(f"{index} is not an index of the array!")
+        if self._tree.dtype.kind == 'i' and not isinstance(delta, numbers.Integral):
+            self._to_float()
+        self._values[index] += delta
+        tree = self._tree
+        i = index
+        while i < n:
+            tree[i] += delta
+            i |= i + 1
+
+    def __setitem__(self, index, value):
+        self.add(index, value - self._values[index])
+
+    def prefix_sum(self, hi):
+        """
+            Returns the sum of the elements i < hi.
+        """
+        if not 0 <= hi <= len(self._tree):
+            raise ValueError(f"{hi} is not a bound of the array!")
+        tree = self._tree
+        total = 0
+        i = hi
+        while i > 0:
+            total += tree[i - 1]
+            i &= i - 1
+        return total.item() if hasattr(total, 'item') else total
+
+    def range_sum(self, lo, hi):
+        """
+            Returns the sum of the elements lo <= i < hi.
+        """
+        return self.prefix_sum(hi) - self.prefix_sum(lo)
+
+    def add_many(self, indices, deltas):
+        """
+            Add deltas[k] to the element at indices[k] for every k; repeated indices accumulate.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        deltas = np.asarray(deltas)
+        if self._tree.dtype.kind == 'i' and deltas.dtype.kind not in 'biu':
+            self._to_float()
+        deltas = np.broadcast_to(deltas.astype(self._tree.dtype), indices.shape)
+        n = len(self._tree)
+        if len(indices) and (indices.min() < 0 or indices.max() >= n):
+            raise ValueError("indices out of range!")
+        np.add.at(self._values, indices, deltas)
+        i = indices
+        while len(i):
+            np.add.at(self._tree, i, deltas)
+            i = i | (i + 1)
+            keep = i < n
+            i, deltas = i[keep], deltas[keep]
+
+    def prefix_sum_many(self, hi):
+        """
+            Returns the array of prefix_sum(hi[k]) for every k.
+        """
+        i = np.array(hi, dtype=np.int64)
+        if len(i) and (i.min() < 0 or i.max() > len(self._tree)):
+            raise ValueError("bounds out of range!")
+        total = np.zeros(len(i), dtype=self._tree.dtype)
+        while True:
+            active = i > 0
+            if not active.any():
+                return total
+            total[active] += self._tree[i[active] - 1]
+            i[active] &= i[active] - 1
+
+    def range_sum_many(self, lo, hi):
+        """
+            Returns the array of range_sum(lo[k], hi[k]) for every k.
+        """
+        return self.prefix_sum_many(hi) - self.prefix_sum_many(lo)
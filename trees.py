@@ -1,6 +1,25 @@
+import asyncio
+import gc
+import sys
+import time
+from contextlib import contextmanager
 from distutils.command.build_scripts import first_line_re
 from linked_list import LinkedQueue, DoublyLinkedList
 
+@contextmanager
+def _gc_paused():
+    """
+        Pause the cyclic garbage collector, which otherwise runs over and over while
+        millions of nodes are allocated and nothing is freed.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 
 class Tree:
     """ Abstract base class representing a tree structure. """
@@ -67,6 +86,123 @@ class Tree:
     """
         return NotImplementedError("")
 
+    def _is_live(self, node):
+        """
+            Returns True if node has not been deleted, alone or with a subtree.
+        """
+        return node._parent is not node
+
+    def _subtree_preorder(self, p):
+        """
+            Generate a preorder traversal of descendants of position p.
+        """
+        yield p
+        for child in self.children(p):
+            # Recursive generator syntax
+            for other in self._subtree_preorder(child):
+                yield other
+
+    def preorder(self):
+        """
+            Generate a preorder iteration of all positions in the tree.
+
+        """
+
+        if not self.is_empty():
+            for p in self._subtree_preorder(self.root()):
+                yield p
+
+    def _subtree_postorder(self, p):
+        """
+            Generate a postorder traversal of descendants of position p.
+        """
+
+        for child in self.children(p):
+            # Recursive generator syntax
+            for other in self._subtree_postorder(child):
+                yield other
+        yield p
+
+    def postorder(self):
+        """
+            Generate a postorder iteration of all positions in the tree.
+        """
+
+        if not self.is_empty():
+            for p in self._subtree_postorder(self.root()):
+                yield p
+
+    def breadthfirst(self):
+        """
+            Generate an iteration of the tree according to breadth first search.
+        """
+
+        if not self.is_empty():
+            q = LinkedQueue()
+            q.enqueue(self.root())
+            while not q.is_empty():
+                p = q.dequeue()
+                yield p
+                for c in self.children(p):
+                    q.enqueue(c)
+
+    async def _achunked(self, positions, chunk, budget):
+        """
+            Generate positions asynchronously, handing control back to the event loop after
+            every chunk positions, or sooner once budget seconds have passed in the slice.
+
+            The time of the caller's loop body counts toward the budget. Cancelling the task
+            consuming the generator stops the traversal at its next pause. Another task that
+            changes the structure of the tree during a pause makes the traversal fail.
+        """
+        if chunk < 1:
+            raise ValueError("chunk must be at least 1!")
+        version = getattr(self, '_version', None)
+        clock = time.perf_counter
+        deadline = clock() + budget if budget is not None else None
+        count = 0
+        for p in positions:
+            yield p
+            count += 1
+            if count >= chunk or (deadline is not None and clock() >= deadline):
+                await asyncio.sleep(0)
+                if getattr(self, '_version', None) != version:
+                    raise ValueError("The tree was changed during the traversal!")
+                deadline = clock() + budget if budget is not None else None
+                count = 0
+
+    def apreorder(self, chunk=1000, budget=None):
+        """
+            Asynchronous preorder(): async for p in tree.apreorder(chunk=1000, budget=0.005).
+        """
+        return self._achunked(self.preorder(), chunk, budget)
+
+    def apostorder(self, chunk=1000, budget=None):
+        """
+            Asynchronous postorder(), paused like apreorder.
+        """
+        return self._achunked(self.postorder(), chunk, budget)
+
+    def abreadthfirst(self, chunk=1000, budget=None):
+        """
+            Asynchronous breadthfirst(), paused like apreorder.
+        """
+        return self._achunked(self.breadthfirst(), chunk, budget)
+
+    def _discard_subtree(self, node):
+        """
+            Mark every node of the unlinked subtree at node as deleted, so that their positions
+            become invalid, and return the number of nodes.
+        """
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(self._child_nodes(node))
+            node._parent = node  # Convention for a deleted node.
+            count += 1
+        return count
+
 
 class BinaryTree(Tree):
     """ Abstract base  class representing a binary tree. """
@@ -100,6 +236,39 @@ class BinaryTree(Tree):
         if self.right(p) is not None:
             yield self.right(p)
 
+    def _subtree_inorder(self, p):
+        """
+            Generate descendants of position p according to inorder traversal.
+        """
+
+        left = self.left(p)
+        right = self.right(p)
+        if left is not None:
+            for other in self._subtree_inorder(left):
+                yield other
+        yield p
+
+        if right is not None:
+            for other in self._subtree_inorder(right):
+                yield other
+
+    def inorder(self):
+        """
+            Generate position of a binary tree according inorder traversal.
+
+            Generate the left subtree, the node, and the right subtree.
+        """
+
+        if not self.is_empty():
+            for p in self._subtree_inorder(self.root()):
+                yield p
+
+    def ainorder(self, chunk=1000, budget=None):
+        """
+            Asynchronous inorder(), paused like apreorder.
+        """
+        return self._achunked(self.inorder(), chunk, budget)
+
 
 class LinkedBinary(BinaryTree):
     class _Node:
@@ -117,6 +286,7 @@ class LinkedBinary(BinaryTree):
         def __init__(self, container, node):
             self._container = container
             self._node = node
+            self._generation = container._generation
 
         def element(self):
             return self._node._element
@@ -132,11 +302,12 @@ class LinkedBinary(BinaryTree):
 
         if not isinstance(p, self.Position):
             raise ValueError(" p is not instance not Position class. ")
-        if p._container is not self:
+        if p._container is not self or p._generation != self._generation:
             raise ValueError("p doesn't belong the this tree. ")
-        if p._node._parent is p._node:
+        node = p._node
+        if node._parent is node:
             raise ValueError("p is a deprecated node. ")
-        return p._node
+        return node
 
     def _make_position(self, node):
         """
@@ -147,6 +318,8 @@ class LinkedBinary(BinaryTree):
     def __init__(self):
         self._root = None
         self._size = 0
+        self._version = 0  # changed by every structural update
+        self._generation = 0  # changed when attach gives all the nodes to another tree
 
     def __len__(self):
         return self._size
@@ -198,6 +371,7 @@ class LinkedBinary(BinaryTree):
         if self._root is not None:
             raise ValueError(" The tree is not empty! ")
         self._size = 1
+        self._version += 1
         self._root = self._Node(e)
         return self._make_position(self._root)
 
@@ -214,6 +388,7 @@ class LinkedBinary(BinaryTree):
         if node._left is not None:
             raise ValueError("p already has a left child! ")
         self._size += 1
+        self._version += 1
         node._left = self._Node(e, node)
         return self._make_position(node._left)
 
@@ -232,6 +407,7 @@ class LinkedBinary(BinaryTree):
             raise ValueError("p already has right child! ")
 
         self._size += 1
+        self._version += 1
 
         node._right = self._Node(e, node)
 
@@ -283,6 +459,7 @@ class LinkedBinary(BinaryTree):
             else:
                 parent._right = child
         self._size -= 1
+        self._version += 1
         node._parent = node  # Convention for a deleted node.
 
         return node._element
@@ -291,7 +468,7 @@ class LinkedBinary(BinaryTree):
         """
       Attach the trees t1 and t2 as the left and right subtrees of a leaf node p.
 
-      Reset t1 and t2 to empty trees.
+      Reset t1 and t2 to empty trees; their positions become invalid.
 
       Raise an error if p is not a leaf node.
 
@@ -305,58 +482,145 @@ class LinkedBinary(BinaryTree):
             raise ValueError("All trees must be of the same type. ")
 
         self._size += len(t1) + len(t2)
+        self._version += 1
 
         if not t1.is_empty():
             t1._root._parent = node
             node._left = t1._root
             t1._root = None
             t1._size = 0
+            t1._version += 1
+            t1._generation += 1
 
         if not t2.is_empty():
             t2._root._parent = node
             node._right = t2._root
             t2._root = None
             t2._size = 0
+            t2._version += 1
+            t2._generation += 1
 
-    def _subtree_preorder(self, p):
+    def _remove_subtree(self, node):
         """
-            Generate a preorder traversal of descendants of position p.
+            Unlink the subtree at node from the tree.
         """
-        yield p
-        for child in self.children(p):
-            # Recursive generator syntax
-            for other in self._subtree_preorder(child):
-                yield other
+        parent = node._parent
+        if parent is None:
+            self._root = None
+        elif node is parent._left:
+            parent._left = None
+        else:
+            parent._right = None
+        self._version += 1
 
-    def preorder(self):
+    def prune(self, p):
         """
-            Generate a preorder iteration of all positions in the tree.
-
+            Remove the subtree at position p, and return the number of positions removed.
         """
+        node = self._validate(p)
+        self._remove_subtree(node)
+        count = self._discard_subtree(node)
+        self._size -= count
+        return count
 
-        if not self.is_empty():
-            for p in self._subtree_preorder(self.root()):
-                yield p
-
-    def _subtree_postorder(self, p):
-        """
-            Generate a postorder traversal of descendants of position p.
+    def detach(self, p):
         """
+            Remove the subtree at position p, and return it as a new tree.
 
-        for child in self.children(p):
-            # Recursive generator syntax
-            for other in self._subtree_postorder(child):
-                yield other
-        yield p
-
-    def postorder(self):
+            The new tree is made of new nodes, so the positions of the subtree become invalid.
         """
-            Generate a postorder iteration of all positions in the tree.
+        node = self._validate(p)
+        self._remove_subtree(node)
+        tree = type(self)()
+        Node = self._Node
+        count = 0
+        with _gc_paused():
+            tree._root = Node(node._element)
+            stack = [(node, tree._root)]
+            while stack:
+                old, new = stack.pop()
+                if old._left is not None:
+                    new._left = Node(old._left._element, new)
+                    stack.append((old._left, new._left))
+                if old._right is not None:
+                    new._right = Node(old._right._element, new)
+                    stack.append((old._right, new._right))
+                old._parent = old  # Convention for a deleted node.
+                count += 1
+        self._size -= count
+        tree._size = count
+        return tree
+
+    def cursor(self, p=None):
+        """
+            Returns a BinaryTreeCursor at position p, or at the root if p is None.
+        """
+        return BinaryTreeCursor(self, p)
+
+    def _child_nodes(self, node):
+        """
+            Generate the child nodes of node, without creating positions.
         """
-
-        if not self.is_empty():
-            for p in self._subtree_postorder(self.root()):
-                yield p
+        if node._left is not None:
+            yield node._left
+        if node._right is not None:
+            yield node._right
+
+    @classmethod
+    def from_level_order(cls, elements, missing=None):
+        """
+            Build a tree from its level order sequence, in which the children of the i-th
+            element are at 2i+1 and 2i+2, and missing marks an absent node.
+
+            The nodes are linked directly, without validating positions.
+        """
+        tree = cls()
+        with _gc_paused():
+            Node = cls._Node
+            nodes = []
+            size = 0
+            for i, e in enumerate(elements):
+                if e is missing:
+                    nodes.append(None)
+                    continue
+                if i == 0:
+                    node = tree._root = Node(e)
+                else:
+                    parent = nodes[(i - 1) // 2]
+                    if parent is None:
+                        raise ValueError(f"Element {i} has no parent!")
+                    node = Node(e, parent)
+                    if i % 2:
+                        parent._left = node
+                    else:
+                        parent._right = node
+                nodes.append(node)
+                size += 1
+        tree._size = size
+        return tree
+
+    @classmethod
+    def from_sorted(cls, elements):
+        """
+            Build a balanced tree whose inorder traversal is the sorted sequence elements.
+        """
+        tree = cls()
+        elements = list(elements)
+        Node = cls._Node
+
+        def build(lo, hi, parent):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = Node(elements[mid], parent)
+            node._left = build(lo, mid, node)
+            node._right = build(mid + 1, hi, node)
+            return node
+
+        with _gc_paused():
+            tree._root = build(0, len(elements), None)
+        tree._size = len(elements)
+        return tree
 
     def positions(self):
         """
@@ -373,56 +637,21 @@ class LinkedBinary(BinaryTree):
         for p in self.positions():
             yield p.element()
 
-    def breadthfirst(self):
-        """
-            Generate an iteration of the tree according to breadth first search.
-        """
-
-        if not self.is_empty():
-            q = LinkedQueue()
-            q.enqueue(self.root())
-            while not q.is_empty():
-                p = q.dequeue()
-                yield p
-                for c in self.children(p):
-                    q.enqueue(c)
-
-    def _subtree_inorder(self, p):
-        """
-            Generate descendants of position p according to inorder traversal.
-        """
-
-        left = self.left(p)
-        right = self.right(p)
-        if left is not None:
-            for other in self._subtree_inorder(left):
-                yield other
-        yield p
-
-        if right is not None:
-            for other in self._subtree_inorder(right):
-                yield other
-
-    def inorder(self):
-        """
-            Generate position of a binary tree according inorder traversal.
-
-            Generate the left subtree, the node, and the right subtree.
-        """
-
-        for p in self._subtree_inorder(self.root()):
-            yield p
 
 
 class GeneralTree(Tree):
 
+    # Children are kept in a list, which is much smaller than a linked list for the usual
+    # fan-outs; a node with more children than this switches to a DoublyLinkedList.
+    _LINKED_FANOUT = 256
+
     class _Node:
         __slots__ = "_element", "_parent", "_children"
 
         def __init__(self, element, parent, children):
             self._element = element
             self._parent = parent
-            self._children = children  # Doubly linked list
+            self._children = children  # None, a list of nodes or a DoublyLinkedList of nodes
 
     class Position(Tree):
 
@@ -446,9 +675,10 @@ class GeneralTree(Tree):
             raise ValueError(" p is not instance not Position class. ")
         if p._container is not self:
             raise ValueError("p doesn't belong the this tree. ")
-        if p._node._parent is p._node:
+        node = p._node
+        if node._parent is node:
             raise ValueError("p is a deprecated node. ")
-        return p._node
+        return node
 
     def _make_position(self, node):
         """
@@ -459,6 +689,81 @@ class GeneralTree(Tree):
     def __init__(self):
         self._root = None
         self._size = 0
+        self._version = 0  # changed by every structural update
+
+    @classmethod
+    def from_parent_array(cls, elements, parents):
+        """
+            Build a tree in which the i-th node stores elements[i] and has the parents[i]-th node
+            as parent; the root has parent -1 or None. Children keep the order of their indices.
+
+            The nodes are linked directly, without validating positions.
+        """
+        tree = cls()
+        Node = cls._Node
+        with _gc_paused():
+            nodes = [Node(e, None, None) for e in elements]
+            if len(nodes) != len(parents):
+                raise ValueError("elements and parents must have the same length!")
+
+            for node, j in zip(nodes, parents):
+                if j is None or j < 0:
+                    if tree._root is not None:
+                        raise ValueError("The tree has more than one root!")
+                    tree._root = node
+                    continue
+                if not j < len(nodes):
+                    raise ValueError(f"{j} is not the index of a node!")
+                parent = nodes[j]
+                node._parent = parent
+                if parent._children is None:
+                    parent._children = [node]
+                else:
+                    parent._children.append(node)
+
+            if nodes and tree._root is None:
+                raise ValueError("The tree has no root!")
+            # a node on a cycle is not reachable from the root
+            order = [tree._root] if nodes else []
+            for node in order:
+                order.extend(tree._child_nodes(node))
+            for node in order:
+                if node._children is not None and len(node._children) > cls._LINKED_FANOUT:
+                    node._children = cls._linked(node._children)
+        if len(order) != len(nodes):
+            raise ValueError("parents contains a cycle!")
+        tree._size = len(nodes)
+        return tree
+
+    @classmethod
+    def from_edges(cls, edges, elements=None):
+        """
+            Build a tree from (parent, child) pairs of node keys; children keep the order of the edges.
+
+            Each node stores elements[key] if elements is given, or else its key.
+        """
+        index = {}
+        keys = []
+        parents = []
+
+        def lookup(key):
+            i = index.get(key)
+            if i is None:
+                i = index[key] = len(keys)
+                keys.append(key)
+                parents.append(-1)
+            return i
+
+        for parent, child in edges:
+            i = lookup(parent)
+            j = lookup(child)
+            if parents[j] != -1:
+                raise ValueError(f"{child} has more than one parent!")
+            parents[j] = i
+
+        if elements is not None:
+            keys = [elements[k] for k in keys]
+        return cls.from_parent_array(keys, parents)
 
     def __len__(self):
         return self._size
@@ -484,6 +789,7 @@ class GeneralTree(Tree):
             raise ValueError(" Tree is not empty! ")
 
         self._size += 1
+        self._version += 1
         self._root = self._Node(e, None, None)
 
         return self._make_position(self._root)
@@ -495,14 +801,45 @@ class GeneralTree(Tree):
         node = self._validate(p)
         return len(node._children) if node._children is not None else 0
 
+    @staticmethod
+    def _linked(nodes):
+        """
+            Returns a DoublyLinkedList of the nodes.
+        """
+        children = DoublyLinkedList()
+        for c in nodes:
+            children._append(c)
+        return children
+
+    def _first_child(self, node):
+        """
+            Returns the first child node of node or None.
+        """
+        children = node._children
+        if not children:
+            return None
+        if type(children) is list:
+            return children[0]
+        return children._header._next._element
+
+    def _last_child(self, node):
+        """
+            Returns the last child node of node or None.
+        """
+        children = node._children
+        if not children:
+            return None
+        if type(children) is list:
+            return children[-1]
+        return children._trailer._prev._element
+
     def children(self, p):
         """
             Generate an iteration of positions of children's of p.
         """
         node = self._validate(p)
-        if self.num_children(p) > 0:
-            for c in node._children:
-                yield self._make_position(c)
+        for c in self._child_nodes(node):
+            yield self._make_position(c)
 
     def replace(self, p, e):
         """
@@ -520,22 +857,14 @@ class GeneralTree(Tree):
             Returns the position of first child of the node at position p or None if p has no children.
         """
         node = self._validate(p)
-        try:
-            first_child = self._make_position(node._children.first())
-        except ValueError:
-            first_child = None  # p has no child
-        return first_child
+        return self._make_position(self._first_child(node))
 
     def last(self, p):
         """
             Returns the position of last child of the node at position p or None if p has no children.
         """
         node = self._validate(p)
-        try:
-            last_child = self._make_position(node._children.last())
-        except ValueError:
-            last_child = None  # p has no child
-        return last_child
+        return self._make_position(self._last_child(node))
 
     def insert_first(self, e, p):
         """
@@ -543,9 +872,17 @@ class GeneralTree(Tree):
         """
         node = self._validate(p)
         new = self._Node(e, node, None)
-        if node._children is None:
-            node._children = DoublyLinkedList()
-        node._children.insert_first(new)    # doubly linked list
+        children = node._children
+        if children is None:
+            node._children = [new]
+        elif type(children) is list:
+            children.insert(0, new)
+            if len(children) > self._LINKED_FANOUT:
+                node._children = self._linked(children)
+        else:
+            children._link_between(new, children._header, children._header._next)
+        self._size += 1
+        self._version += 1
 
         return self._make_position(new)
 
@@ -557,9 +894,17 @@ class GeneralTree(Tree):
 
         node = self._validate(p)
         new = self._Node(e, node, None)
-        if node._children is None:
-            node._children = DoublyLinkedList()
-        node._children.insert_last(new)  # doubly linked list
+        children = node._children
+        if children is None:
+            node._children = [new]
+        elif type(children) is list:
+            children.append(new)
+            if len(children) > self._LINKED_FANOUT:
+                node._children = self._linked(children)
+        else:
+            children._append(new)
+        self._size += 1
+        self._version += 1
 
         return self._make_position(new)
 
@@ -568,21 +913,94 @@ class GeneralTree(Tree):
             Remove and return the first element of the node at position p; raise an error if the list is empty.
         """
         node = self._validate(p)
-        if node._children.is_empty():
+        if not node._children:
             raise ValueError("p has no children.")
-        element = node._children.delete_first()  # doubly linked list
-        return element
+        child = self._first_child(node)
+        self._remove_subtree(child, first=True)
+        self._size -= self._discard_subtree(child)
+        return child._element
 
     def delete_last(self, p):
         """
             Remove and return the last element of the node at position p; raise an error if the list is empty.
         """
         node = self._validate(p)
-        if node._children.is_empty():
+        if not node._children:
             raise ValueError("p has no children.")
-        element = node._children.delete_last()  # doubly linked list
+        child = self._last_child(node)
+        self._remove_subtree(child, last=True)
+        self._size -= self._discard_subtree(child)
 
-        return element
+        return child._element
+
+    def _remove_subtree(self, node, first=False, last=False):
+        """
+            Unlink the subtree at node from the tree.
+
+            first or last tell that node is known to be the first or last child.
+        """
+        parent = node._parent
+        if parent is None:
+            self._root = None
+        else:
+            children = parent._children
+            if type(children) is list:
+                if first:
+                    del children[0]
+                elif last:
+                    children.pop()
+                else:
+                    del children[next(i for i, c in enumerate(children) if c is node)]
+                if not children:
+                    parent._children = None
+            else:
+                if first:
+                    link = children._header._next
+                elif last:
+                    link = children._trailer._prev
+                else:
+                    link = children._header._next
+                    while link._element is not node:
+                        link = link._next
+                children._delete_node(link)  # doubly linked list
+        self._version += 1
+
+    def prune(self, p):
+        """
+            Remove the subtree at position p, and return the number of positions removed.
+        """
+        node = self._validate(p)
+        self._remove_subtree(node)
+        count = self._discard_subtree(node)
+        self._size -= count
+        return count
+
+    def detach(self, p):
+        """
+            Remove the subtree at position p, and return it as a new tree.
+
+            The new tree is made of new nodes, so the positions of the subtree become invalid.
+        """
+        node = self._validate(p)
+        self._remove_subtree(node)
+        tree = type(self)()
+        Node = self._Node
+        count = 0
+        with _gc_paused():
+            tree._root = Node(node._element, None, None)
+            stack = [(node, tree._root)]
+            while stack:
+                old, new = stack.pop()
+                if old._children:
+                    olds = list(self._child_nodes(old))
+                    children = [Node(c._element, new, None) for c in olds]
+                    stack.extend(zip(olds, children))
+                    new._children = children if type(old._children) is list else self._linked(children)
+                old._parent = old  # Convention for a deleted node.
+                count += 1
+        self._size -= count
+        tree._size = count
+        return tree
 
     def depth(self, p):
         """
@@ -611,46 +1029,6 @@ class GeneralTree(Tree):
 
         return self._height(self.root())
 
-    def _subtree_preorder(self, p):
-        """
-            Generate a preorder traversal of descendants of position p.
-        """
-        yield p
-        for child in self.children(p):
-            # Recursive generator syntax
-            for other in self._subtree_preorder(child):
-                yield other
-
-    def preorder(self):
-        """
-            Generate a preorder iteration of all positions in the tree.
-
-        """
-
-        if not self.is_empty():
-            for p in self._subtree_preorder(self.root()):
-                yield p
-
-    def _subtree_postorder(self, p):
-        """
-            Generate a postorder traversal of descendants of position p.
-        """
-
-        for child in self.children(p):
-            # Recursive generator syntax
-            for other in self._subtree_postorder(child):
-                yield other
-        yield p
-
-    def postorder(self):
-        """
-            Generate a postorder iteration of all positions in the tree.
-        """
-
-        if not self.is_empty():
-            for p in self._subtree_postorder(self.root()):
-                yield p
-
     def positions(self):
         """
             Generate an iteration of all position in the tree.
@@ -725,16 +1103,692 @@ class GeneralTree(Tree):
             else:
                 content += r
 
+    def cursor(self, p=None):
+        """
+            Returns a GeneralTreeCursor at position p, or at the root if p is None.
+        """
+        return GeneralTreeCursor(self, p)
+
+    def _child_nodes(self, node):
+        """
+            Generate the child nodes of node, without creating positions.
+        """
+        children = node._children
+        if children is None:
+            return
+        if type(children) is list:
+            for c in children:
+                yield c
+        else:
+            link = children._header._next
+            while link is not children._trailer:
+                yield link._element
+                link = link._next
+
+    def _node_footprint(self, node):
+        """
+            Returns the number of bytes used by node and the structure holding its children.
+        """
+        size = sys.getsizeof(node)
+        children = node._children
+        if type(children) is list:
+            size += sys.getsizeof(children)
+        elif children is not None:
+            # the list object, its two sentinels and one list node per child.
+            size += sys.getsizeof(children)
+            size += sys.getsizeof(children._header) * (2 + len(children))
+        return size
+
+    def compress(self):
+        """
+            Returns a CompressedTree in which identical subtrees are stored only once.
+
+            Elements are identical if they have the same type and compare equal (floats also
+            need the same repr, to keep 0.0 and -0.0 apart). Nodes with unhashable elements
+            are never shared.
+        """
+        table = {}  # (type, element, children) -> shared node
+        footprint = [0]
+        unshared = [0]
+
+        def intern(node):
+            footprint[0] += self._node_footprint(node)
+            # read before the children, while a lazily loaded node is surely resident
+            e = node._element
+            children = tuple(intern(c) for c in self._child_nodes(node))
+            key = (type(e), repr(e) if type(e) is float else e, children)
+            try:
+                shared = table.get(key)
+            except TypeError:  # unhashable element
+                unshared[0] += 1
+                return CompressedTree._Node(e, children)
+            if shared is None:
+                shared = table[key] = CompressedTree._Node(e, children)
+            return shared
+
+        root = intern(self._root) if self._root is not None else None
+        return CompressedTree(root, len(table) + unshared[0], footprint[0])
+
+
+class CompressedTree(Tree):
+    """
+        Immutable tree in which identical subtrees are hash-consed into a single shared node,
+        so the structure is a DAG. Built with GeneralTree.compress().
+    """
+
+    class _Node:
+        __slots__ = "_element", "_children", "_size"
+
+        def __init__(self, element, children):
+            self._element = element
+            self._children = children  # tuple of shared nodes
+            self._size = 1 + sum(c._size for c in children)
+
+    class Position(Tree.Position):
+        """
+            A shared node may be reached from several parents, so a position also keeps
+            the position of the parent it was reached from.
+        """
+
+        def __init__(self, container, node, parent):
+            self._container = container
+            self._node = node
+            self._parent = parent
+
+        def element(self):
+            return self._node._element
+
+        def __eq__(self, other):
+            """
+        returns True if other is a position representing the same location.
+      """
+            return (type(self) == type(other) and self._node is other._node
+                    and self._parent == other._parent)
+
+    def _validate(self, p):
+        """ Raise error if p is not a valid position otherwise return the node at position p. """
+
+        if not isinstance(p, self.Position):
+            raise ValueError(" p is not instance not Position class. ")
+        if p._container is not self:
+            raise ValueError("p doesn't belong the this tree. ")
+        return p._node
+
+    def __init__(self, root, dag_size, tree_bytes):
+        self._root = root
+        self._dag_size = dag_size
+        self._tree_bytes = tree_bytes
+
+    def __len__(self):
+        """
+            Returns the number of positions of the expanded tree.
+        """
+        return self._root._size if self._root is not None else 0
+
+    def root(self):
+        """
+            returns the position of the root node.
+        """
+        return self.Position(self, self._root, None) if self._root is not None else None
+
+    def parent(self, p):
+        """
+            returns the position of the parent of p.
+        """
+        self._validate(p)
+        return p._parent
+
+    def num_children(self, p):
+        """
+            Return the number of children of position p.
+        """
+        node = self._validate(p)
+        return len(node._children)
+
+    def children(self, p):
+        """
+            Generate an iteration of positions of children's of p.
+        """
+        node = self._validate(p)
+        for c in node._children:
+            yield self.Position(self, c, p)
+
+    def _subtree_preorder(self, p):
+        """
+            Generate a preorder traversal of descendants of position p.
+        """
+        yield p
+        for child in self.children(p):
+            for other in self._subtree_preorder(child):
+                yield other
+
+    def preorder(self):
+        """
+            Generate a preorder iteration of all positions in the tree.
+        """
+        if not self.is_empty():
+            for p in self._subtree_preorder(self.root()):
+                yield p
+
+    def _subtree_postorder(self, p):
+        """
+            Generate a postorder traversal of descendants of position p.
+        """
+        for child in self.children(p):
+            for other in self._subtree_postorder(child):
+                yield other
+        yield p
+
+    def postorder(self):
+        """
+            Generate a postorder iteration of all positions in the tree.
+        """
+        if not self.is_empty():
+            for p in self._subtree_postorder(self.root()):
+                yield p
+
+    def positions(self):
+        """
+            Generate an iteration of all position in the tree.
+        """
+        for p in self.preorder():
+            yield p
+
+    def parenthetic(self):
+        """
+            Returns a parenthetic representation of a tree, the same as GeneralTree.parenthetic().
+
+            The representation of a shared subtree is built only once.
+        """
+        memo = {}
+
+        def subtree(node):
+            result = memo.get(id(node))
+            if result is None:
+                result = str(node._element)
+                if node._children:
+                    result += ' (' + ', '.join(subtree(c) for c in node._children) + ')'
+                memo[id(node)] = result
+            return result
+
+        if not self.is_empty():
+            return subtree(self._root)
+
+        return ""
+
+    def expand(self):
+        """
+            Returns a GeneralTree with a separate copy of every shared subtree.
+        """
+        tree = GeneralTree()
+
+        def copy(shared, parent):
+            node = GeneralTree._Node(shared._element, parent, None)
+            if shared._children:
+                children = [copy(c, node) for c in shared._children]
+                if len(children) > GeneralTree._LINKED_FANOUT:
+                    children = GeneralTree._linked(children)
+                node._children = children
+            return node
+
+        if self._root is not None:
+            tree._root = copy(self._root, None)
+            tree._size = len(self)
+        return tree
+
+    def dag_size(self):
+        """
+            Returns the number of distinct nodes actually stored.
+        """
+        return self._dag_size
+
+    def compression_ratio(self):
+        """
+            Returns the number of positions of the expanded tree per stored node.
+        """
+        return len(self) / self._dag_size if self._dag_size else 1.0
+
+    def memory_saved(self):
+        """
+            Returns the number of bytes saved compared with the GeneralTree this was compressed from.
+        """
+        seen = set()
+        dag_bytes = 0
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            if id(node) not in seen:
+                seen.add(id(node))
+                dag_bytes += sys.getsizeof(node) + sys.getsizeof(node._children)
+                stack.extend(node._children)
+        return self._tree_bytes - dag_bytes
+
+
+class TreeCursor:
+    """
+        A movable reference into a tree. Moving the cursor updates it in place instead of
+        creating a new Position, and any structural change of the tree since the cursor
+        was created or synced makes it stale.
+
+        The to_* methods return True if the cursor moved, or False if there was nowhere to go.
+    """
+
+    __slots__ = "_tree", "_node", "_version", "_generation"
+
+    def __init__(self, tree, p=None):
+        self._tree = tree
+        if p is not None:
+            self._node = tree._validate(p)
+        elif tree._root is not None:
+            self._node = tree._root
+        else:
+            raise ValueError("The tree is empty!")
+        self._version = tree._version
+        self._generation = getattr(tree, '_generation', None)
+
+    def _check(self):
+        if self._version != self._tree._version:
+            raise ValueError("The tree has changed since the cursor was created!")
+        return self._node
+
+    def is_valid(self):
+        """
+            Returns True if the tree has not changed since the cursor was created or synced.
+        """
+        return self._version == self._tree._version
+
+    def sync(self):
+        """
+            Accept the changes made to the tree since the cursor was created; raise an error
+            if the node under the cursor was deleted, or removed with a subtree.
+        """
+        if not self._tree._is_live(self._node):
+            raise ValueError("The node under the cursor was deleted!")
+        if getattr(self._tree, '_generation', None) != self._generation:
+            raise ValueError("The node under the cursor was moved to another tree!")
+        self._version = self._tree._version
+
+    def element(self):
+        return self._check()._element
+
+    def replace(self, e):
+        """
+            Replace the element under the cursor with e, and return the previous element.
+        """
+        node = self._check()
+        old_value = node._element
+        node._element = e
+        return old_value
+
+    def position(self):
+        """
+            Returns a Position of the node under the cursor.
+        """
+        return self._tree._make_position(self._check())
+
+    def is_root(self):
+        return self._check()._parent is None
+
+    def to_root(self):
+        self._check()
+        self._node = self._tree._root
+        return True
+
+    def to_parent(self):
+        parent = self._check()._parent
+        if parent is None:
+            return False
+        self._node = parent
+        return True
+
 
-tree = GeneralTree()
+class BinaryTreeCursor(TreeCursor):
+    """
+        Cursor of a LinkedBinary.
+    """
+
+    __slots__ = ()
+
+    def is_leaf(self):
+        node = self._check()
+        return node._left is None and node._right is None
+
+    def _move(self, node):
+        if node is None:
+            return False
+        self._node = node
+        return True
+
+    def to_left(self):
+        return self._move(self._check()._left)
+
+    def to_right(self):
+        return self._move(self._check()._right)
+
+    def to_first_child(self):
+        node = self._check()
+        return self._move(node._left if node._left is not None else node._right)
+
+    def to_last_child(self):
+        node = self._check()
+        return self._move(node._right if node._right is not None else node._left)
+
+    def to_next_sibling(self):
+        node = self._check()
+        parent = node._parent
+        return parent is not None and node is parent._left and self._move(parent._right)
+
+    def to_prev_sibling(self):
+        node = self._check()
+        parent = node._parent
+        return parent is not None and node is parent._right and self._move(parent._left)
+
+
+class GeneralTreeCursor(TreeCursor):
+    """
+        Cursor of a GeneralTree.
+
+        The cursor remembers where the nodes it went through are in their parent's children
+        (an index in a list of children, or an entry of a linked list of children), so moving
+        to a sibling does not search the parent's children.
+    """
 
-with open('electronics.txt') as f:
-    content = f.read()
+    __slots__ = "_link", "_links"
 
-tree.parse_parenthetic(content)
+    def __init__(self, tree, p=None):
+        super().__init__(tree, p)
+        self._link = None   # place of the node in its parent's children, if known
+        self._links = []    # places of its ancestors, as far as they are known
+
+    def _find_link(self):
+        node = self._node
+        children = node._parent._children
+        if type(children) is list:
+            link = next(i for i, c in enumerate(children) if c is node)
+        else:
+            link = children._header._next
+            while link._element is not node:
+                link = link._next
+        self._link = link
+        return link
+
+    def sync(self):
+        """
+            Accept the changes made to the tree; the places of the nodes in their parents'
+            children may have changed, so they are found again when needed.
+        """
+        super().sync()
+        self._link = None
+        self._links = [None] * len(self._links)
+
+    def is_leaf(self):
+        return not self._check()._children
+
+    def to_root(self):
+        self._check()
+        self._node = self._tree._root
+        self._link = None
+        self._links = []
+        return True
+
+    def to_parent(self):
+        parent = self._check()._parent
+        if parent is None:
+            return False
+        self._node = parent
+        self._link = self._links.pop() if self._links else None
+        return True
+
+    def _to_child(self, children, first):
+        if not children:
+            return False
+        self._links.append(self._link)
+        if type(children) is list:
+            self._link = 0 if first else len(children) - 1
+            self._node = children[self._link]
+        else:
+            self._link = children._header._next if first else children._trailer._prev
+            self._node = self._link._element
+        return True
+
+    def to_first_child(self):
+        return self._to_child(self._check()._children, True)
+
+    def to_last_child(self):
+        return self._to_child(self._check()._children, False)
+
+    def _to_sibling(self, step):
+        node = self._check()
+        if node._parent is None:
+            return False
+        children = node._parent._children
+        link = self._link if self._link is not None else self._find_link()
+        if type(children) is list:
+            link += step
+            if not 0 <= link < len(children):
+                return False
+            self._node = children[link]
+        else:
+            link = link._next if step > 0 else link._prev
+            if link._next is None or link._prev is None:  # sentinel: no more siblings
+                return False
+            self._node = link._element
+        self._link = link
+        return True
+
+    def to_next_sibling(self):
+        return self._to_sibling(1)
+
+    def to_prev_sibling(self):
+        return self._to_sibling(-1)
+
+
+class IndexedTree(GeneralTree):
+    """
+        General tree that maintains an index from hierarchical labels (as printed by
+        preorder_label, e.g. '1.3.2.') and from elements to positions.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._labels = {}      # node -> label tuple
+        self._by_label = {}    # label tuple -> node
+        self._by_element = {}  # element -> {node: None}, in insertion order
+
+    @staticmethod
+    def _parse_label(label):
+        """
+            Convert '1.3.2.' or (1, 3, 2) to a label tuple.
+        """
+        if isinstance(label, str):
+            return tuple(int(j) for j in label.split('.') if j)
+        return tuple(label)
+
+    def _index_element(self, node):
+        self._by_element.setdefault(node._element, {})[node] = None
+
+    def _unindex_element(self, node):
+        nodes = self._by_element[node._element]
+        del nodes[node]
+        if not nodes:
+            del self._by_element[node._element]
+
+    def _assign(self, node, label):
+        """
+            Give node the label, relabelling its descendants only where a label changed.
+        """
+        labels, by_label = self._labels, self._by_label
+        stack = [(node, label)]
+        while stack:
+            node, label = stack.pop()
+            old = labels.get(node)
+            if old == label:
+                continue
+            if old is not None and by_label.get(old) is node:
+                del by_label[old]
+            labels[node] = label
+            by_label[label] = node
+            children = list(self._child_nodes(node))
+            for i in range(len(children), 0, -1):
+                stack.append((children[i - 1], label + (i,)))
+
+    def _relabel_children(self, node):
+        label = self._labels[node]
+        for i, c in enumerate(self._child_nodes(node), 1):
+            self._assign(c, label + (i,))
+
+    def _unindex_subtree(self, node):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            label = self._labels.pop(n)
+            if self._by_label.get(label) is n:
+                del self._by_label[label]
+            self._unindex_element(n)
+            stack.extend(self._child_nodes(n))
+
+    def _index_subtree(self, node, label):
+        """
+            Label and index, in preorder, every node of the subtree at node, which is not indexed yet.
+        """
+        stack = [(node, label)]
+        while stack:
+            node, label = stack.pop()
+            self._labels[node] = label
+            self._by_label[label] = node
+            self._index_element(node)
+            children = list(self._child_nodes(node))
+            for i in range(len(children), 0, -1):
+                stack.append((children[i - 1], label + (i,)))
+
+    @classmethod
+    def from_parent_array(cls, elements, parents):
+        """
+            Build a tree as GeneralTree.from_parent_array does, and index all its nodes.
+        """
+        tree = super().from_parent_array(elements, parents)
+        if tree._root is not None:
+            tree._index_subtree(tree._root, (1,))
+        return tree
+
+    def add_root(self, e):
+        hash(e)  # an unhashable element raises an error before the tree changes
+        p = super().add_root(e)
+        self._assign(self._root, (1,))
+        self._index_element(self._root)
+        return p
+
+    def insert_first(self, e, p):
+        """
+            Make e as the first child of the node at position p, and return the position of that child.
+
+            The labels of the later siblings and their descendants are shifted.
+        """
+        hash(e)
+        q = super().insert_first(e, p)
+        self._index_element(q._node)
+        self._relabel_children(p._node)
+        return q
+
+    def insert_last(self, e, p):
+        """
+            Make e as the last child of the node at position p, and return the position of that child.
+        """
+        hash(e)
+        q = super().insert_last(e, p)
+        node = q._node
+        self._index_element(node)
+        self._assign(node, self._labels[node._parent] + (self.num_children(p),))
+        return q
+
+    def delete_first(self, p):
+        """
+            Remove and return the first element of the node at position p; raise an error if the list is empty.
+
+            The labels of the remaining children and their descendants are shifted.
+        """
+        node = self._validate(p)
+        if node._children:
+            self._unindex_subtree(self._first_child(node))
+        element = super().delete_first(p)
+        self._relabel_children(node)
+        return element
+
+    def delete_last(self, p):
+        """
+            Remove and return the last element of the node at position p; raise an error if the list is empty.
+        """
+        node = self._validate(p)
+        if node._children:
+            self._unindex_subtree(self._last_child(node))
+        return super().delete_last(p)
+
+    def prune(self, p):
+        """
+            Remove the subtree at position p, and return the number of positions removed.
+
+            The labels of the later siblings and their descendants are shifted.
+        """
+        node = self._validate(p)
+        parent = node._parent
+        self._unindex_subtree(node)
+        count = super().prune(p)
+        if parent is not None:
+            self._relabel_children(parent)
+        return count
+
+    def detach(self, p):
+        """
+            Remove the subtree at position p, and return it as a new IndexedTree.
+        """
+        node = self._validate(p)
+        parent = node._parent
+        self._unindex_subtree(node)
+        tree = super().detach(p)
+        if parent is not None:
+            self._relabel_children(parent)
+        tree._index_subtree(tree._root, (1,))
+        return tree
+
+    def replace(self, p, e):
+        node = self._validate(p)
+        hash(e)
+        self._unindex_element(node)
+        old_value = super().replace(p, e)
+        self._index_element(node)
+        return old_value
+
+    def set_element(self, e, p):
+        self.replace(p, e)
+
+    def label(self, p):
+        """
+            Returns the hierarchical label of position p, e.g. '1.3.2.'.
+        """
+        node = self._validate(p)
+        return '.'.join(str(j) for j in self._labels[node]) + '.'
+
+    def find(self, label):
+        """
+            Returns the position with the given hierarchical label or None if there is no such position.
+        """
+        return self._make_position(self._by_label.get(self._parse_label(label)))
+
+    def find_all(self, e):
+        """
+            Returns a list of the positions storing element e, in insertion order.
+        """
+        return [self._make_position(n) for n in self._by_element.get(e, ())]
+
+    def find_prefix(self, label):
+        """
+            Generate the positions whose label starts with the given label, in preorder.
+        """
+        p = self.find(label)
+        if p is not None:
+            for other in self._subtree_preorder(p):
+                yield other
 
-# for p in tree.positions():
-#     print(p.element())
 
 
 def preorder_indented(t, p, d):
@@ -769,7 +1823,18 @@ def preorder_label(t, p, d, path):
     path.pop()
 
 
-preorder_label(tree, tree.root(), 0, [0])
+if __name__ == '__main__':
+    tree = GeneralTree()
+
+    with open('electronics.txt') as f:
+        content = f.read()
+
+    tree.parse_parenthetic(content)
+
+    # for p in tree.positions():
+    #     print(p.element())
+
+    preorder_label(tree, tree.root(), 0, [0])
 
 
 